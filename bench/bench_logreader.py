@@ -0,0 +1,100 @@
+import argparse
+import io
+import os
+import struct
+import sys
+import time
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.logreader import LogReader
+from src.streamparser import StreamParser
+
+
+NOISE = b'2024-06-10T08:01:48.000000Z  INFO sc_network::service: Peer connected peer_id=12D3KooWExample\n'
+
+
+def build_stream(paths, frame_size, noise):
+    # Multiplex the corpus the way the daemon does, one frame per line or,
+    # with frame_size, fixed size frames that ignore line boundaries.
+    # noise adds that many uninteresting INFO lines after each corpus line.
+    lines = [line for path in paths for line in open(path, 'rb')]
+    data = b''.join(line + NOISE * noise for line in lines)
+    pieces = data.splitlines(keepends=True) if not frame_size else [data[i:i + frame_size] for i in range(0, len(data), frame_size)]
+    return b''.join(struct.pack('>BxxxL', 1, len(piece)) + piece for piece in pieces)
+
+
+def frames(raw):
+    # What docker-py's container.logs(stream=True) yields: one frame each
+    while True:
+        header = raw.read(8)
+        if not header:
+            return
+        _, size = struct.unpack('>BxxxL', header)
+        yield raw.read(size)
+
+
+def parse(log):
+    try:
+        parsed_log = StreamParser.parse_log(log.decode('utf-8').strip())
+    except UnicodeDecodeError:
+        # A multi-byte character cut in half by a frame boundary
+        return None
+
+    if parsed_log:
+        return StreamParser.parse_event(parsed_log, 'bench', 'bench', 'farmer')
+
+
+def run_frames(stream):
+    events = 0
+    for log in frames(io.BytesIO(stream)):
+        events += parse(log) is not None
+    return events
+
+
+def run_reader(stream):
+    events = 0
+    reader = LogReader(True, StreamParser.matcher.prefilter)
+    for log in reader.read(io.BufferedReader(io.BytesIO(stream))):
+        events += parse(log) is not None
+    return events
+
+
+def measure(function, stream, rounds):
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        events = function(stream)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+
+    tracemalloc.start()
+    function(stream)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return events, best, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description='docker-py frames vs LogReader on a multiplexed stream')
+    parser.add_argument('corpus', nargs='*', help='Log files to replay (defaults to bench/corpus/*.log)')
+    parser.add_argument('--rounds', type=int, default=5, help='Rounds per reader, best is reported')
+    parser.add_argument('--frame_size', type=int, default=0, help='Cut frames at N bytes instead of at line ends')
+    parser.add_argument('--noise', type=int, default=0, help='Uninteresting INFO lines added after each corpus line')
+    args = parser.parse_args()
+
+    corpus_dir = os.path.join(ROOT, 'bench', 'corpus')
+    paths = args.corpus or sorted(os.path.join(corpus_dir, name) for name in os.listdir(corpus_dir) if name.endswith('.log'))
+    stream = build_stream(paths, args.frame_size, args.noise)
+
+    print(f"Stream: {len(stream):,} bytes from {len(paths)} files")
+    for name, function in [('frames', run_frames), ('logreader', run_reader)]:
+        events, elapsed, peak = measure(function, stream, args.rounds)
+        print(f"{name:<10} {events} events in {elapsed:.3f}s, {len(stream) / elapsed / 1024 ** 2:.1f} MB/s, peak alloc {peak / 1024:.0f} KiB")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,86 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+import types
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.streamparser import StreamParser
+from src.patterns import Patterns
+
+
+def load_baseline(rev):
+    # Load src/streamparser.py as it was at the given git revision so the
+    # old if-chain can be timed against the current rule table. Older
+    # revisions slept 5s after every line a rule failed to parse, e.g. the
+    # Plotting sector retry lines in the cluster corpus. That is not parse
+    # time, so the baseline gets a time module whose sleep returns at once.
+    code = subprocess.check_output(['git', 'show', f'{rev}:src/streamparser.py'], cwd=ROOT).decode('utf-8')
+    module = types.ModuleType('baseline_streamparser')
+    exec(compile(code, f'{rev}:src/streamparser.py', 'exec'), module.__dict__)
+
+    no_sleep = types.ModuleType('time')
+    no_sleep.__dict__.update(time.__dict__)
+    no_sleep.sleep = lambda seconds: None
+    module.time = no_sleep
+
+    return module.StreamParser
+
+
+def load_corpus(paths):
+    lines = []
+    for path in paths:
+        with open(path, encoding='utf-8') as f:
+            lines.extend(line.strip() for line in f)
+    return lines
+
+
+def run(parser, lines, rounds):
+    # Each revision's parse_event takes its own parse_log's output
+    logs = [parsed_log for parsed_log in map(parser.parse_log, lines) if parsed_log]
+    best = None
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for log in logs:
+            parser.parse_event(log, 'bench', 'bench', 'farmer')
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return len(logs) / best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='parse_event microbenchmark')
+    parser.add_argument('corpus', nargs='*', help='Log files to replay (defaults to bench/corpus/*.log)')
+    parser.add_argument('--baseline', type=str, help='Git revision to compare against, its sleeps on unparseable lines are skipped')
+    parser.add_argument('--rounds', type=int, default=5, help='Rounds per parser, best is reported')
+    parser.add_argument('--stats', action='store_true', help='Print per-pattern hit/miss/time counters')
+    args = parser.parse_args()
+
+    corpus_dir = os.path.join(ROOT, 'bench', 'corpus')
+    paths = args.corpus or sorted(os.path.join(corpus_dir, name) for name in os.listdir(corpus_dir) if name.endswith('.log'))
+    logs = load_corpus(paths)
+
+    print(f"Corpus: {len(logs)} lines from {len(paths)} files")
+
+    if args.baseline:
+        baseline_rate = run(load_baseline(args.baseline), logs, args.rounds)
+        print(f"baseline ({args.baseline}): {baseline_rate:,.0f} lines/sec")
+
+    current_rate = run(StreamParser, logs, args.rounds)
+    print(f"current: {current_rate:,.0f} lines/sec")
+
+    if args.baseline:
+        print(f"speedup: {current_rate / baseline_rate:.2f}x")
+
+    if args.stats:
+        Patterns.enable_stats()
+        run(StreamParser, logs, 1)
+        for row in Patterns.get_stats():
+            print(f"{row['pattern']:<50} hits={row['hits']:<8} misses={row['misses']:<8} seconds={row['seconds']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import docker
+
+from src.logger import logger
+from src.nexus import Nexus
+from src.resourcemonitor import ResourceMonitor
+from src.cgroupreader import CgroupReader
+from src.discovery import Discovery
+from bench.stub_docker import StubDocker
+from bench.stub_nexus import StubNexus
+
+
+def run_cycles(docker_client, discovery, nexus_url, interval, workers, cycles, stats_stream):
+    # Runs the resource monitor until it has completed the given number of
+    # cycles and returns its cycle stats
+    ResourceMonitor.cycle_stats.update({'cycles': 0, 'last_seconds': 0, 'max_seconds': 0, 'total_seconds': 0.0, 'containers': 0, 'failed': 0, 'overruns': 0})
+    stop_event = threading.Event()
+    thread = threading.Thread(
+        target=ResourceMonitor.start_monitor,
+        args=(discovery, docker_client, stop_event, nexus_url, '127.0.0.1', interval, workers, stats_stream)
+    )
+    thread.start()
+
+    while ResourceMonitor.get_cycle_stats()['cycles'] < cycles:
+        stop_event.wait(0.05)
+
+    stop_event.set()
+    thread.join()
+    return ResourceMonitor.get_cycle_stats()
+
+
+def read_latency(docker_client, containers, reader):
+    # Milliseconds to get one container's counters, cgroupfs against a
+    # one-shot stats call
+    start = time.perf_counter()
+    for container_data in containers:
+        reader.counters(container_data['container_id'])
+    cgroupfs = (time.perf_counter() - start) * 1000 / len(containers)
+
+    start = time.perf_counter()
+    docker_client.api.stats(containers[0]['container_id'], stream=False)
+    api = (time.perf_counter() - start) * 1000
+
+    return cgroupfs, api
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Resource monitor cycle duration against a stub Docker daemon')
+    parser.add_argument('--containers', type=int, default=30, help='Number of fake containers')
+    parser.add_argument('--stats_latency', type=float, default=1.0, help='Seconds the stub holds each stats request')
+    parser.add_argument('--interval', type=float, default=10, help='Monitor interval in seconds')
+    parser.add_argument('--workers', type=str, default='1,8,32', help='Comma separated pool sizes to compare')
+    parser.add_argument('--cycles', type=int, default=2, help='Cycles per pool size')
+    parser.add_argument('--stats_stream', type=int, default=0, help='Use per-container stats streams instead of one-shot calls')
+    parser.add_argument('--cgroupfs', type=int, default=0, help='Read usage from a fake cgroup v2 tree instead of the stats API')
+    args = parser.parse_args()
+
+    logger.setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as directory:
+        socket_path = os.path.join(directory, 'docker.sock')
+        stub = StubDocker(socket_path, args.containers, stats_latency=args.stats_latency).start()
+        nexus = StubNexus().start()
+        Nexus.configure_session()
+
+        docker_client = docker.DockerClient(base_url=f'unix://{socket_path}', max_pool_size=64)
+        discovery = Discovery()
+        discovery.load(docker_client)
+        containers = discovery.snapshot()
+
+        # Keep the fake cgroup counters moving while the monitor runs
+        stop_cgroupfs = threading.Event()
+        advancer = None
+        if args.cgroupfs:
+            cgroup_root = os.path.join(directory, 'cgroup')
+            os.makedirs(cgroup_root)
+            stub.write_cgroupfs(cgroup_root)
+
+            def advance():
+                while not stop_cgroupfs.wait(0.5):
+                    stub.write_cgroupfs(cgroup_root)
+
+            advancer = threading.Thread(target=advance, daemon=True)
+            advancer.start()
+            ResourceMonitor.cgroup_reader = CgroupReader(cgroup_root)
+
+            cgroupfs, api = read_latency(docker_client, containers, ResourceMonitor.cgroup_reader)
+            print(f"Counters per container: cgroupfs {cgroupfs:.3f}ms, one-shot stats call {api:.1f}ms")
+
+        source = 'cgroupfs' if args.cgroupfs else 'stats streams' if args.stats_stream else f'one-shot stats latency {args.stats_latency}s'
+        print(f"{args.containers} containers, {source}, interval {args.interval}s")
+        for workers in [int(value) for value in args.workers.split(',')]:
+            stats = run_cycles(docker_client, discovery, nexus.url, args.interval, workers, args.cycles, args.stats_stream)
+            print(f"workers={workers:<3} avg cycle {stats['avg_seconds'] * 1000:.1f}ms, max {stats['max_seconds'] * 1000:.1f}ms, overruns {stats['overruns']}, failed {stats['failed']}")
+
+        # The writer has to be done before the directory is removed
+        stop_cgroupfs.set()
+        if advancer:
+            advancer.join()
+
+        nexus.stop()
+        stub.stop()
+
+
+if __name__ == '__main__':
+    main()
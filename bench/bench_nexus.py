@@ -0,0 +1,87 @@
+import argparse
+import logging
+import os
+import sys
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.logger import logger
+from src.nexus import Nexus
+from src.streamparser import StreamParser
+from bench.stub_nexus import StubNexus
+
+
+def load_events(paths):
+    events = []
+    for path in paths:
+        container_type = os.path.basename(path).rsplit('.', 1)[0]
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                parsed_log = StreamParser.parse_log(line.strip())
+                if not parsed_log:
+                    continue
+                event = StreamParser.parse_event(parsed_log, container_type, container_type, container_type)
+                if event:
+                    events.append((event, container_type))
+    return events
+
+
+def replay(events, nexus_url):
+    start = time.perf_counter()
+    for event, container_type in events:
+        # handle_event mutates event_data, so hand it a fresh copy each run
+        event = event.copy()
+        StreamParser.handle_event(event, nexus_url, container_type, container_type, container_type)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Nexus ingestion throughput against a local stub')
+    parser.add_argument('corpus', nargs='*', help='Log files to replay (defaults to bench/corpus/*.log)')
+    parser.add_argument('--latency', type=float, default=0.002, help='Stub latency per request in seconds')
+    parser.add_argument('--batch_size', type=int, default=500, help='Batch size for the batched run')
+    parser.add_argument('--batch_delay', type=float, default=0.5, help='Batch delay for the batched run')
+    args = parser.parse_args()
+
+    logger.setLevel(logging.WARNING)
+
+    corpus_dir = os.path.join(ROOT, 'bench', 'corpus')
+    paths = args.corpus or sorted(os.path.join(corpus_dir, name) for name in os.listdir(corpus_dir) if name.endswith('.log'))
+    events = load_events(paths)
+    print(f"Replaying {len(events)} events, stub latency {args.latency * 1000:.1f}ms")
+
+    stub = StubNexus(latency=args.latency).start()
+    elapsed = replay(events, stub.url)
+    direct = stub.stats()
+    print(f"direct:  {len(events) / elapsed:,.0f} events/sec, {direct['requests']} requests, {direct['items']} items, {Nexus.get_connection_stats()}")
+    stub.stop()
+
+    stub = StubNexus(latency=args.latency).start()
+    stop_event = threading.Event()
+    # Room for every write the corpus produces, so the batched run
+    # delivers the same items as the direct one instead of dropping some
+    batcher = Nexus.enable_batching(stub.url, args.batch_size, args.batch_delay, max_buffer=max(direct['items'], 1))
+    flusher = threading.Thread(target=batcher.start_flush, args=(stop_event,))
+    flusher.start()
+
+    start = time.perf_counter()
+    replay(events, stub.url)
+    stop_event.set()
+    flusher.join()
+    elapsed = time.perf_counter() - start
+    Nexus.batcher = None
+
+    batched = stub.stats()
+    print(f"batched: {len(events) / elapsed:,.0f} events/sec, {batched['requests']} requests, {batched['items']} items")
+    stub.stop()
+
+    print(f"delivered {batched['items']} of {direct['items']} writes, {batcher.dropped_items} dropped, {batcher.spilled} spilled")
+    if batched['items'] != direct['items']:
+        sys.exit('batched run did not deliver every write, the rates above are not comparable')
+
+
+if __name__ == '__main__':
+    main()
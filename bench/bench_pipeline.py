@@ -0,0 +1,239 @@
+import argparse
+import gc
+import json
+import logging
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from src.logger import logger
+from src.nexus import Nexus
+from src.streamparser import StreamParser
+from bench.stub_nexus import StubSink
+
+# One corpus per container type, bench/corpus/{container_type}.log
+container_types = ['node', 'farmer', 'cluster_controller', 'cluster_cache', 'cluster_plotter', 'cluster_farmer']
+
+
+def load_corpus(path):
+    with open(path, 'rb') as f:
+        return [line for line in f if line.strip()]
+
+
+def process(log, container_type, prefilter=None):
+    # The steps of LogReader's prefilter and StreamParser.process_log
+    # without the cursor, True if the line became an event
+    if prefilter and not prefilter.test(log):
+        return False
+
+    parsed_log = StreamParser.parse_log(log.decode('utf-8').strip())
+    if not parsed_log:
+        return False
+
+    event = StreamParser.parse_event(parsed_log, container_type, container_type, container_type)
+    if not event:
+        return False
+
+    StreamParser.handle_event(event, 'http://stub-nexus', container_type, container_type, container_type)
+    return True
+
+
+def timed_run(logs, container_type, prefilter):
+    clock = time.perf_counter_ns
+    latencies = []
+    events = 0
+
+    start = clock()
+    for log in logs:
+        line_start = clock()
+        if process(log, container_type, prefilter):
+            events += 1
+        latencies.append(clock() - line_start)
+
+    return clock() - start, events, latencies
+
+
+def measure_allocations(logs, container_type, prefilter):
+    # Bytes allocated at the peak of each line, and memory blocks still
+    # held once the whole corpus went through. Separate from the timed
+    # runs, tracing slows every allocation down.
+    gc.collect()
+    blocks = sys.getallocatedblocks()
+    peak_bytes = 0
+
+    tracemalloc.start()
+    for log in logs:
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        process(log, container_type, prefilter)
+        peak_bytes += tracemalloc.get_traced_memory()[1] - current
+    tracemalloc.stop()
+
+    gc.collect()
+    return peak_bytes / len(logs), (sys.getallocatedblocks() - blocks) / len(logs)
+
+
+def measure_event_memory(logs, container_type, prefilter):
+    # Bytes held per parsed event while it waits to be handled, as in the
+    # parse pool's result queue or the coalescer
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    events = []
+    for log in logs:
+        if prefilter and not prefilter.test(log):
+            continue
+        parsed_log = StreamParser.parse_log(log.decode('utf-8').strip())
+        if parsed_log:
+            event = StreamParser.parse_event(parsed_log, container_type, container_type, container_type)
+            if event:
+                events.append(event)
+
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    return held / len(events) if events else 0
+
+
+def percentile(values, share):
+    return values[min(len(values) - 1, int(len(values) * share))]
+
+
+def bench_corpus(logs, container_type, rounds, prefilter):
+    best = None
+    latencies = []
+
+    for _ in range(rounds):
+        # A fresh sink per round, so writes count one pass over the corpus
+        sink = StubSink()
+        Nexus.local.batcher = sink
+        elapsed, events, round_latencies = timed_run(logs, container_type, prefilter)
+        latencies.extend(round_latencies)
+        best = elapsed if best is None else min(best, elapsed)
+
+    # Taken before the allocation pass writes into the same sink
+    writes, write_bytes = sink.items, sink.bytes
+    alloc_bytes, retained_blocks = measure_allocations(logs, container_type, prefilter)
+    Nexus.local.batcher = None
+
+    event_bytes = measure_event_memory(logs, container_type, prefilter)
+    skipped = sum(not prefilter.test(log) for log in logs) if prefilter else 0
+
+    latencies.sort()
+    seconds = best / 1e9
+    return {
+        'lines': len(logs),
+        'events': events,
+        'skipped_pct': round(skipped / len(logs) * 100, 1),
+        'writes': writes,
+        'write_bytes': write_bytes,
+        'lines_per_sec': round(len(logs) / seconds),
+        'events_per_sec': round(events / seconds),
+        'p50_us': round(percentile(latencies, 0.50) / 1000, 2),
+        'p99_us': round(percentile(latencies, 0.99) / 1000, 2),
+        'alloc_bytes_per_line': round(alloc_bytes),
+        'retained_blocks_per_line': round(retained_blocks, 3),
+        'bytes_per_event': round(event_bytes),
+    }, seconds, latencies
+
+
+def get_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, stderr=subprocess.DEVNULL).decode('utf-8').strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, path):
+    # Change in lines/sec and p99 against an earlier run's JSON
+    with open(path) as f:
+        previous = json.load(f)
+
+    print(f"\nAgainst {previous.get('commit')} from {previous.get('timestamp')}:")
+    for name, result in results['corpora'].items():
+        before = previous['corpora'].get(name)
+        if not before:
+            continue
+        rate_change = (result['lines_per_sec'] / before['lines_per_sec'] - 1) * 100
+        p99_change = (result['p99_us'] / before['p99_us'] - 1) * 100 if before['p99_us'] else 0
+        print(f"{name:<20} lines/sec {rate_change:+6.1f}%   p99 {p99_change:+6.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='parse_log -> parse_event -> handle_event throughput per container type')
+    parser.add_argument('--corpus_dir', type=str, default=os.path.join(ROOT, 'bench', 'corpus'), help='Directory holding {container_type}.log corpora')
+    parser.add_argument('--types', type=str, nargs='*', default=container_types, help='Container types to replay')
+    parser.add_argument('--rounds', type=int, default=5, help='Timed rounds per corpus, the best is reported')
+    parser.add_argument('--prefilter', type=int, default=1, help="Drop lines with LogReader's prefilter first, like the runtimes do (0 disables)")
+    parser.add_argument('--json', type=str, help='Write the results as JSON to this file, - for stdout')
+    parser.add_argument('--compare', type=str, help='Earlier JSON results to compare against')
+    args = parser.parse_args()
+
+    logger.setLevel(logging.WARNING)
+
+    results = {
+        'timestamp': datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ'),
+        'commit': get_commit(),
+        'python': platform.python_version(),
+        'rounds': args.rounds,
+        'prefilter': args.prefilter,
+        'corpora': {},
+    }
+
+    prefilter = StreamParser.matcher.prefilter if args.prefilter else None
+    total_lines = total_events = 0
+    total_seconds = 0.0
+    all_latencies = []
+
+    print(f"{'corpus':<20} {'lines':>7} {'events':>7} {'writes':>7} {'lines/s':>9} {'events/s':>9} {'p50 us':>8} {'p99 us':>8} {'B/line':>7} {'B/event':>7} {'skip %':>6}")
+    for container_type in args.types:
+        path = os.path.join(args.corpus_dir, f'{container_type}.log')
+        if not os.path.exists(path):
+            print(f"{container_type:<20} no corpus at {path}")
+            continue
+
+        result, seconds, latencies = bench_corpus(load_corpus(path), container_type, args.rounds, prefilter)
+        results['corpora'][container_type] = result
+        total_lines += result['lines']
+        total_events += result['events']
+        total_seconds += seconds
+        all_latencies.extend(latencies)
+
+        print(f"{container_type:<20} {result['lines']:>7} {result['events']:>7} {result['writes']:>7} {result['lines_per_sec']:>9,} {result['events_per_sec']:>9,} {result['p50_us']:>8} {result['p99_us']:>8} {result['alloc_bytes_per_line']:>7} {result['bytes_per_event']:>7} {result['skipped_pct']:>6}")
+
+    if not total_lines:
+        return
+
+    all_latencies.sort()
+    results['total'] = {
+        'lines': total_lines,
+        'events': total_events,
+        'lines_per_sec': round(total_lines / total_seconds),
+        'events_per_sec': round(total_events / total_seconds),
+        'p50_us': round(percentile(all_latencies, 0.50) / 1000, 2),
+        'p99_us': round(percentile(all_latencies, 0.99) / 1000, 2),
+    }
+    total = results['total']
+    print(f"{'total':<20} {total['lines']:>7} {total['events']:>7} {'':>7} {total['lines_per_sec']:>9,} {total['events_per_sec']:>9,} {total['p50_us']:>8} {total['p99_us']:>8}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+    if args.json == '-':
+        print(json.dumps(results, indent=2))
+    elif args.json:
+        with open(args.json, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
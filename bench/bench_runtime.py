@@ -0,0 +1,146 @@
+import argparse
+import json
+import logging
+import multiprocessing
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def child_usage():
+    # CPU seconds and peak RSS of live child processes, e.g. parse workers,
+    # which RUSAGE_CHILDREN only reports once they have exited
+    cpu, rss_kb = 0.0, 0
+    ticks = os.sysconf('SC_CLK_TCK')
+
+    for child in multiprocessing.active_children():
+        with open(f'/proc/{child.pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        cpu += (int(fields[11]) + int(fields[12])) / ticks
+
+        with open(f'/proc/{child.pid}/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    rss_kb += int(line.split()[1])
+
+    return cpu, rss_kb
+
+
+def worker(args):
+    # Runs one Hubble runtime against the stubs for a fixed time, then
+    # prints its own CPU time, peak RSS and thread count as JSON
+    os.environ['DOCKER_HOST'] = f'unix://{args.socket}'
+
+    from src.logger import logger
+    from src.streamparser import StreamParser
+
+    logger.setLevel(logging.WARNING)
+
+    # Count lines as they reach the parser
+    processed = [0]
+    process_log = StreamParser.process_log
+
+    def counting_process_log(*process_args):
+        processed[0] += 1
+        process_log(*process_args)
+
+    StreamParser.process_log = staticmethod(counting_process_log)
+
+    config = {
+        'host_ip': '127.0.0.1',
+        'nexus_url': args.nexus_url,
+        'batch_size': 500,
+        'batch_delay': 0.5,
+        'cursor_path': os.path.join(args.state_dir, 'cursors.db'),
+        'parse_workers': args.parse_workers
+    }
+
+    if args.worker == 'async':
+        from src.asynchubble import AsyncHubble
+        hubble = AsyncHubble(config)
+    else:
+        from src.hubble import Hubble
+        hubble = Hubble(config)
+
+    def report():
+        time.sleep(args.duration)
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        children_cpu, children_rss_kb = child_usage()
+        print(json.dumps({
+            'runtime': args.worker,
+            'lines': processed[0],
+            'cpu_seconds': round(usage.ru_utime + usage.ru_stime + children_cpu, 3),
+            'max_rss_mb': round((usage.ru_maxrss + children_rss_kb) / 1024, 1),
+            'threads': threading.active_count()
+        }), flush=True)
+
+        # Children hold our stdout open, the parent would wait for them
+        for child in multiprocessing.active_children():
+            child.kill()
+        os._exit(0)
+
+    threading.Thread(target=report, daemon=True).start()
+    hubble.run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='CPU and memory of the thread and asyncio runtimes')
+    parser.add_argument('--containers', type=int, default=40, help='Number of fake containers')
+    parser.add_argument('--rate', type=int, default=50, help='Log lines per second per container')
+    parser.add_argument('--duration', type=float, default=20, help='Seconds to run each runtime')
+    parser.add_argument('--runtimes', type=str, default='thread,async', help='Comma separated runtimes to measure')
+    parser.add_argument('--parse_workers', type=int, default=0, help='Parse in N worker processes')
+    parser.add_argument('--worker', type=str, help=argparse.SUPPRESS)
+    parser.add_argument('--socket', type=str, help=argparse.SUPPRESS)
+    parser.add_argument('--nexus_url', type=str, help=argparse.SUPPRESS)
+    parser.add_argument('--state_dir', type=str, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        worker(args)
+        return
+
+    from bench.stub_docker import StubDocker
+    from bench.stub_nexus import StubNexus
+
+    nexus = StubNexus().start()
+    results = []
+
+    for runtime in args.runtimes.split(','):
+        with tempfile.TemporaryDirectory() as state_dir:
+            socket_path = os.path.join(state_dir, 'docker.sock')
+            docker = StubDocker(socket_path, args.containers, args.rate).start()
+
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--worker', runtime, '--socket', socket_path,
+                 '--nexus_url', nexus.url, '--state_dir', state_dir, '--duration', str(args.duration), '--parse_workers', str(args.parse_workers)],
+                capture_output=True, text=True, cwd=ROOT
+            )
+            docker.stop()
+
+            lines = [line for line in output.stdout.splitlines() if line.startswith('{')]
+            if not lines:
+                print(f"{runtime} failed:\n{output.stderr}")
+                continue
+
+            result = json.loads(lines[-1])
+            result['cpu_ms_per_1k_lines'] = round(result['cpu_seconds'] * 1000 / max(1, result['lines'] / 1000), 1)
+            results.append(result)
+
+    nexus.stop()
+
+    print(f"{args.containers} containers, {args.rate} lines/sec each, {args.duration}s per runtime")
+    print(f"{'runtime':<8} {'lines':>8} {'cpu s':>8} {'cpu ms/1k':>10} {'rss MB':>8} {'threads':>8}")
+    for result in results:
+        print(f"{result['runtime']:<8} {result['lines']:>8} {result['cpu_seconds']:>8} {result['cpu_ms_per_1k_lines']:>10} {result['max_rss_mb']:>8} {result['threads']:>8}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,318 @@
+import argparse
+import json
+import os
+import re
+import socketserver
+import struct
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+class StubDocker:
+    # Minimal stand-in for the Docker Engine API on a Unix socket. It
+    # serves a number of fake node and farmer containers whose log streams
+    # replay the bench corpus at a fixed rate, multiplexed like the real
+    # daemon, so both Hubble runtimes can be driven without Docker.
+    def __init__(self, socket_path, containers=10, rate=50, stats_latency=0.0):
+        self.socket_path = socket_path
+        self.rate = rate
+        # The real daemon holds one-shot stats for about a second to sample precpu
+        self.stats_latency = stats_latency
+        self.lock = threading.Lock()
+        self.started = time.monotonic()
+        self.lines_sent = 0
+        self.corpus = {}
+
+        for container_type in ['node', 'farmer']:
+            with open(os.path.join(ROOT, 'bench', 'corpus', f'{container_type}.log'), 'rb') as f:
+                self.corpus[container_type] = [line for line in f if line.strip()]
+
+        # Container events for /events, and a condition to wait for new ones
+        self.events = []
+        self.changed = threading.Condition(self.lock)
+
+        self.containers = {}
+        for index in range(containers):
+            self.create(index)
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Headers and body in one write, Nagle does not apply to Unix sockets
+            wbufsize = 65536
+
+            def log_message(self, format, *args):
+                pass
+
+            def address_string(self):
+                return stub.socket_path
+
+            def handle(self):
+                # Log streams end when the client hangs up
+                try:
+                    super().handle()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def finish(self):
+                try:
+                    super().finish()
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+            def reply(self, status, payload):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                # Drop the /v1.xx API version prefix and the query string
+                path = re.sub(r'^/v[\d.]+', '', self.path.split('?')[0])
+                parts = path.strip('/').split('/')
+
+                if path == '/version':
+                    self.reply(200, {'ApiVersion': '1.45', 'Version': 'bench'})
+                elif path == '/info':
+                    self.reply(200, {'Name': 'bench', 'OperatingSystem': 'Linux', 'NCPU': os.cpu_count(), 'MemTotal': 64 * 1024 ** 3})
+                elif path == '/events':
+                    self.stream_events()
+                elif path == '/containers/json':
+                    self.reply(200, [{'Id': container_id, 'Names': [attrs['Name']]} for container_id, attrs in stub.containers.items()])
+                elif parts[0] == 'containers' and parts[1] in stub.containers:
+                    attrs = stub.containers[parts[1]]
+                    if parts[2] == 'json':
+                        self.reply(200, attrs)
+                    elif parts[2] == 'stats' and 'stream=0' not in self.path and 'stream=False' not in self.path:
+                        self.stream_stats()
+                    elif parts[2] == 'stats':
+                        time.sleep(stub.stats_latency)
+                        self.reply(200, stub.stats_document())
+                    elif parts[2] == 'logs':
+                        self.stream_logs(attrs)
+                    else:
+                        self.reply(404, {'message': 'not found'})
+                elif parts[0] == 'images':
+                    container_type = parts[1].split(':')[-1]
+                    self.reply(200, {
+                        'Id': parts[1],
+                        'RepoTags': [f'ghcr.io/subspace/{container_type}:bench'],
+                        'Config': {'Labels': {'org.opencontainers.image.version': 'bench'}}
+                    })
+                else:
+                    self.reply(404, {'message': 'not found'})
+
+            def stream_stats(self):
+                # One JSON document per line and second, chunked like the
+                # daemon does it, docker-py relies on the chunk boundaries
+                self.close_connection = True
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+
+                while True:
+                    document = json.dumps(stub.stats_document()).encode('utf-8') + b'\n'
+                    self.wfile.write(b'%x\r\n%s\r\n' % (len(document), document))
+                    self.wfile.flush()
+                    time.sleep(1)
+
+            def stream_events(self):
+                # Events since the requested time, then new ones as they
+                # happen, one JSON document per line and chunk
+                query = parse_qs(urlsplit(self.path).query)
+                since = int(query.get('since', ['0'])[0])
+                self.close_connection = True
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Transfer-Encoding', 'chunked')
+                self.end_headers()
+                self.wfile.flush()
+
+                position = 0
+                while True:
+                    with stub.changed:
+                        stub.changed.wait_for(lambda: len(stub.events) > position, timeout=1)
+                        events = stub.events[position:]
+                        position = len(stub.events)
+
+                    for event in events:
+                        if event['time'] >= since:
+                            document = json.dumps(event).encode('utf-8') + b'\n'
+                            self.wfile.write(b'%x\r\n%s\r\n' % (len(document), document))
+                    self.wfile.flush()
+
+            def stream_logs(self, attrs):
+                # Frames of stream type, three zero bytes and a big-endian
+                # payload length, sent until the client goes away or the
+                # container stops
+                self.close_connection = True
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/vnd.docker.raw-stream')
+                self.end_headers()
+
+                lines = stub.corpus[attrs['type']]
+                per_tick = max(1, stub.rate // 10)
+                position = 0
+
+                # Without follow the whole corpus is the history, sent at once
+                query = parse_qs(urlsplit(self.path).query)
+                if query.get('follow', ['0'])[0] in ['0', 'false', 'False']:
+                    history = b''.join(struct.pack('>BxxxL', 1, len(line)) + line for line in lines)
+                    try:
+                        self.wfile.write(history)
+                        self.wfile.flush()
+                    except (BrokenPipeError, ConnectionResetError):
+                        pass
+                    with stub.lock:
+                        stub.lines_sent += len(lines)
+                    return
+
+                try:
+                    while attrs['State']['Running']:
+                        chunk = bytearray()
+                        for _ in range(per_tick):
+                            line = lines[position % len(lines)]
+                            chunk += struct.pack('>BxxxL', 1, len(line)) + line
+                            position += 1
+                        self.wfile.write(chunk)
+                        self.wfile.flush()
+
+                        with stub.lock:
+                            stub.lines_sent += per_tick
+
+                        time.sleep(0.1)
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+
+        class Server(socketserver.ThreadingUnixStreamServer):
+            daemon_threads = True
+            # The asyncio runtime connects for every container at once
+            request_queue_size = 256
+
+        if os.path.exists(socket_path):
+            os.remove(socket_path)
+        self.server = Server(socket_path, Handler)
+
+    def create(self, index, running=True):
+        # Adds a fake node or farmer container, started unless told otherwise
+        container_type = 'node' if index % 2 == 0 else 'farmer'
+        container_id = f'{index:064x}'
+        self.containers[container_id] = {
+            'Id': container_id,
+            'Name': f'/bench-{container_type}-{index}',
+            'Image': f'sha256:{container_type}',
+            'Config': {
+                'Image': f'ghcr.io/subspace/{container_type}:bench',
+                'Labels': {'com.subspace.name': f'bench-{container_type}-{index}'},
+                'Cmd': ['run', '--chain', 'gemini-3h'] if container_type == 'node' else ['farm', '--reward-address', 'st000'],
+                'Tty': False
+            },
+            'State': {'Status': 'created', 'Running': False, 'StartedAt': '2024-06-10T08:00:00.000000000Z'},
+            'HostConfig': {'NetworkMode': 'bridge'},
+            'NetworkSettings': {'Networks': {'bridge': {'IPAddress': f'172.17.0.{index + 2}', 'NetworkID': 'bridge'}}},
+            'type': container_type
+        }
+
+        if running:
+            self.set_running(container_id, True)
+        return container_id
+
+    def emit(self, action, container_id):
+        with self.changed:
+            self.events.append({'Type': 'container', 'Action': action, 'Actor': {'ID': container_id, 'Attributes': {}}, 'time': int(time.time())})
+            self.changed.notify_all()
+
+    def set_running(self, container_id, running):
+        # Starts or stops a container, a stopped one's log stream ends
+        self.containers[container_id]['State'].update({'Status': 'running' if running else 'exited', 'Running': running})
+        self.emit('start' if running else 'die', container_id)
+
+    def rename(self, container_id, name):
+        self.containers[container_id]['Name'] = f'/{name}'
+        self.containers[container_id]['Config']['Labels'].pop('com.subspace.name', None)
+        self.emit('rename', container_id)
+
+    def remove(self, container_id):
+        if self.containers[container_id]['State']['Running']:
+            self.set_running(container_id, False)
+        del self.containers[container_id]
+        self.emit('destroy', container_id)
+
+    def stats_document(self):
+        # cgroup v2 style document whose counters grow with time: 25% of
+        # one of four CPUs, 1 MB/s written, 100 kB/s received
+        elapsed = time.monotonic() - self.started
+        return {
+            'read': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'memory_stats': {'usage': 800 * 1024 ** 2, 'stats': {'inactive_file': 32 * 1024 ** 2, 'active_anon': 512 * 1024 ** 2, 'active_file': 256 * 1024 ** 2}, 'limit': 64 * 1024 ** 3},
+            'cpu_stats': {'cpu_usage': {'total_usage': int(elapsed * 0.25e9)}, 'system_cpu_usage': int(elapsed * 4e9), 'online_cpus': 4},
+            'precpu_stats': {'cpu_usage': {'total_usage': int((elapsed - 1) * 0.25e9)}, 'system_cpu_usage': int((elapsed - 1) * 4e9), 'online_cpus': 4},
+            'blkio_stats': {'io_service_bytes_recursive': [{'major': 8, 'minor': 0, 'op': 'read', 'value': 0}, {'major': 8, 'minor': 0, 'op': 'write', 'value': int(elapsed * 1e6)}]},
+            'networks': {'eth0': {'rx_bytes': int(elapsed * 1e5), 'tx_bytes': 0}}
+        }
+
+    def write_cgroupfs(self, root):
+        # The same counters as stats_document, as a cgroup v2 tree laid out
+        # by Docker's systemd cgroup driver. Call again to advance them.
+        elapsed = time.monotonic() - self.started
+        open(os.path.join(root, 'cgroup.controllers'), 'w').write('cpuset cpu io memory pids\n')
+
+        for container_id in self.containers:
+            path = os.path.join(root, 'system.slice', f'docker-{container_id}.scope')
+            os.makedirs(path, exist_ok=True)
+            files = {
+                'cpu.stat': f'usage_usec {int(elapsed * 0.25e6)}\nuser_usec 0\nsystem_usec 0\n',
+                'memory.current': f'{800 * 1024 ** 2}\n',
+                'memory.stat': f'anon {512 * 1024 ** 2}\nfile {288 * 1024 ** 2}\nactive_file {256 * 1024 ** 2}\ninactive_file {32 * 1024 ** 2}\n',
+                'memory.max': 'max\n',
+                'io.stat': f'8:0 rbytes=0 wbytes={int(elapsed * 1e6)} rios=0 wios=0 dbytes=0 dios=0\n',
+            }
+            # Replaced whole, the monitor may be reading them
+            for name, content in files.items():
+                with open(os.path.join(path, name + '.tmp'), 'w') as f:
+                    f.write(content)
+                os.replace(os.path.join(path, name + '.tmp'), os.path.join(path, name))
+
+    def stats(self):
+        with self.lock:
+            return {'lines_sent': self.lines_sent}
+
+    def start(self):
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+        os.remove(self.socket_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in Docker Engine API')
+    parser.add_argument('--socket', type=str, default='/tmp/stub-docker.sock', help='Unix socket to listen on')
+    parser.add_argument('--containers', type=int, default=10, help='Number of fake containers')
+    parser.add_argument('--rate', type=int, default=50, help='Log lines per second per container')
+    parser.add_argument('--stats_latency', type=float, default=0.0, help='Seconds before answering a stats request')
+    args = parser.parse_args()
+
+    stub = StubDocker(args.socket, args.containers, args.rate, args.stats_latency)
+    print(f"Stub Docker listening on unix://{args.socket}")
+
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(stub.stats(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
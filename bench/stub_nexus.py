@@ -0,0 +1,136 @@
+import argparse
+import json
+import random
+import threading
+import time
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class StubNexus:
+    # Minimal stand-in for the Nexus API. It accepts the single-item
+    # /insert and /upsert endpoints as well as /bulk/{action}/{entity},
+    # counts what it receives and can add latency or fail a share of
+    # requests to emulate a loaded or restarting server.
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, fail_rate=0.0):
+        self.latency = latency
+        self.fail_rate = fail_rate
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.items = 0
+        self.bytes = 0
+        self.failures = 0
+        self.received = {}
+
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = 'HTTP/1.1'
+            # Send headers and body in one segment, otherwise keep-alive
+            # clients stall on delayed ACKs
+            disable_nagle_algorithm = True
+            wbufsize = 65536
+
+            def log_message(self, format, *args):
+                pass
+
+            def reply(self, status, payload):
+                body = json.dumps(payload).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path.startswith('/stats'):
+                    self.reply(200, stub.stats())
+                else:
+                    self.reply(200, {'data': []})
+
+            def do_POST(self):
+                length = int(self.headers.get('Content-Length', 0))
+                payload = json.loads(self.rfile.read(length) or b'null')
+
+                if stub.latency:
+                    time.sleep(stub.latency)
+
+                if stub.fail_rate and random.random() < stub.fail_rate:
+                    with stub.lock:
+                        stub.failures += 1
+                    self.reply(503, {'message': 'Service Unavailable'})
+                    return
+
+                parts = self.path.strip('/').split('/')
+                if parts[0] == 'bulk':
+                    key = f"{parts[1]}/{parts[2]}"
+                    count = len(payload.get('items', []))
+                else:
+                    key = '/'.join(parts[:2])
+                    count = 1
+
+                with stub.lock:
+                    stub.requests += 1
+                    stub.items += count
+                    stub.bytes += length
+                    stub.received[key] = stub.received.get(key, 0) + count
+
+                self.reply(201 if parts[0] in ['insert', 'bulk'] else 200, {'message': 'ok', 'count': count})
+
+        self.server = ThreadingHTTPServer((host, port), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://{host}:{self.server.server_address[1]}"
+
+    def stats(self):
+        with self.lock:
+            return {'requests': self.requests, 'items': self.items, 'bytes': self.bytes, 'failures': self.failures, 'received': dict(self.received)}
+
+    def start(self):
+        thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class StubSink:
+    # In-process stand-in for the Nexus write path. It takes the place of a
+    # NexusBatcher, serializes every write the same way and only counts
+    # them, so parsing can be timed without any network in the way.
+    def __init__(self):
+        self.items = 0
+        self.bytes = 0
+        self.received = {}
+
+    def add(self, action, entity, item, low_value=False):
+        serialized = json.dumps(item, default=str)
+        key = f"{action}/{entity}"
+        self.items += 1
+        self.bytes += len(serialized)
+        self.received[key] = self.received.get(key, 0) + 1
+
+    def stats(self):
+        return {'items': self.items, 'bytes': self.bytes, 'received': dict(self.received)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Stand-in Nexus server')
+    parser.add_argument('--host', type=str, default='127.0.0.1', help='Bind address')
+    parser.add_argument('--port', type=int, default=9998, help='Port to listen on')
+    parser.add_argument('--latency', type=float, default=0.0, help='Seconds to wait before answering each write')
+    parser.add_argument('--fail_rate', type=float, default=0.0, help='Share of writes answered with 503')
+    args = parser.parse_args()
+
+    stub = StubNexus(args.host, args.port, args.latency, args.fail_rate)
+    print(f"Stub Nexus listening on {stub.url}")
+
+    try:
+        stub.server.serve_forever()
+    except KeyboardInterrupt:
+        print(json.dumps(stub.stats(), indent=2))
+
+
+if __name__ == '__main__':
+    main()
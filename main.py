@@ -8,6 +8,39 @@ def main():
 
     parser.add_argument('--host_ip', type=str, required=True, help='Host IP')
     parser.add_argument('--nexus_url', type=str, required=True, help='Nexus URL')
+    parser.add_argument('--batch_size', type=int, default=0, help='Send Nexus writes in bulk requests of up to N items (0 sends them one by one)')
+    parser.add_argument('--batch_delay', type=float, default=1.0, help='Maximum seconds a write waits in the batch before it is sent')
+    parser.add_argument('--buffer_size', type=int, default=10000, help='Maximum Nexus writes held in memory while Nexus is unreachable')
+    parser.add_argument('--overflow', type=str, default='drop_low_value', choices=['drop_low_value', 'spill'], help='What to do when the delivery buffer is full. drop_low_value drops status updates and spills other writes to --spill_path')
+    parser.add_argument('--spill_path', type=str, default='./spool/overflow.jsonl', help='File that overflowing writes are spilled to')
+    parser.add_argument('--spool_path', type=str, default='', help='Write every Nexus write to an on-disk spool in this directory before delivering it')
+    parser.add_argument('--spool_max_mb', type=int, default=1024, help='Disk budget for the spool in MB')
+    parser.add_argument('--cursor_path', type=str, default='./state/cursors.db', help='SQLite file recording how far each container log was read')
+    parser.add_argument('--http_pool_size', type=int, default=32, help='Maximum open keep-alive connections to Nexus')
+    parser.add_argument('--http_timeout', type=float, default=30, help='Read timeout in seconds for Nexus requests')
+    parser.add_argument('--connection_stats', type=int, default=0, help='Log Nexus connection reuse every N seconds (0 disables)')
+    parser.add_argument('--delta_upserts', type=int, default=1, help='Only send entity fields that changed since the last upsert (0 sends every upsert in full)')
+    parser.add_argument('--upsert_heartbeat', type=float, default=60, help='Seconds after which an unchanged entity is sent in full again (0 never)')
+    parser.add_argument('--coalesce_window', type=float, default=5, help='Send only the newest status update per container, event and farm every N seconds (0 sends each one)')
+    parser.add_argument('--backfill', type=int, default=1, help='Read logs older than --backfill_hours in bulk before tailing (0 replays them line by line)')
+    parser.add_argument('--backfill_hours', type=float, default=1, help='Backfill when logs were last read longer ago than this, and skip older status events while doing so')
+    parser.add_argument('--backfill_batch', type=int, default=500, help='Nexus writes delivered at a time while backfilling, as bulk requests if --batch_size > 0')
+    parser.add_argument('--dead_letter_path', type=str, default='./spool/deadletter.jsonl', help='File for log lines that fail to parse, empty to only count them')
+    parser.add_argument('--dead_letter_rate', type=int, default=60, help='Lines per rule and minute written to the dead-letter file')
+    parser.add_argument('--dead_letter_stats', type=int, default=300, help='Log the failed lines per rule every this many seconds (0 disables)')
+    parser.add_argument('--monitor_interval', type=float, default=10, help='Seconds between container resource samples')
+    parser.add_argument('--monitor_workers', type=int, default=8, help='Containers whose stats are fetched in parallel')
+    parser.add_argument('--monitor_stats', type=int, default=0, help='Log resource monitor cycle durations every N seconds (0 disables)')
+    parser.add_argument('--stats_stream', type=int, default=1, help='Keep a stats stream open per container instead of a one-shot call per cycle (0 disables)')
+    parser.add_argument('--cgroup_path', type=str, default='/sys/fs/cgroup', help="Host cgroupfs to read container usage from, falls back to the Docker stats API ('' disables)")
+    parser.add_argument('--io_stats', type=int, default=0, help='Also send block I/O and network rates per container (needs a Nexus that stores them)')
+    parser.add_argument('--parse_workers', type=int, default=0, help='Parse logs in N worker processes (0 parses in the reader threads)')
+    parser.add_argument('--runtime', type=str, default='thread', choices=['thread', 'async'], help='One thread per container, or every container on one asyncio loop')
+    parser.add_argument('--prefilter_stats', type=int, default=0, help='Log the share of log lines skipped before parsing every N seconds (0 disables)')
+    parser.add_argument('--pattern_stats', type=int, default=0, help='Log per-pattern regex cost every N seconds (0 disables)')
+    parser.add_argument('--plot_stats', type=int, default=0, help='Send sectors/hour, sector time percentiles and plot ETA per farm and plotter every N seconds (0 disables, needs a Nexus that stores them)')
+    parser.add_argument('--plot_stats_window', type=float, default=1, help='Hours of sectors the plotting summaries are computed over')
+    parser.add_argument('--rules_path', type=str, default='', help='JSON file with the event rules, created from the built-in ones if missing and reloaded on SIGHUP (empty uses the built-in rules)')
 
     # Parse the arguments
     args = parser.parse_args()
@@ -15,12 +48,50 @@ def main():
     # Access the arguments
     config = {
         'host_ip': args.host_ip,
-        'nexus_url': args.nexus_url
+        'nexus_url': args.nexus_url,
+        'batch_size': args.batch_size,
+        'batch_delay': args.batch_delay,
+        'buffer_size': args.buffer_size,
+        'overflow': args.overflow,
+        'spill_path': args.spill_path,
+        'spool_path': args.spool_path,
+        'spool_max_mb': args.spool_max_mb,
+        'cursor_path': args.cursor_path,
+        'http_pool_size': args.http_pool_size,
+        'http_timeout': args.http_timeout,
+        'connection_stats': args.connection_stats,
+        'delta_upserts': args.delta_upserts,
+        'upsert_heartbeat': args.upsert_heartbeat,
+        'coalesce_window': args.coalesce_window,
+        'backfill': args.backfill,
+        'backfill_hours': args.backfill_hours,
+        'backfill_batch': args.backfill_batch,
+        'dead_letter_path': args.dead_letter_path,
+        'dead_letter_rate': args.dead_letter_rate,
+        'dead_letter_stats': args.dead_letter_stats,
+        'prefilter_stats': args.prefilter_stats,
+        'pattern_stats': args.pattern_stats,
+        'plot_stats': args.plot_stats,
+        'plot_stats_window': args.plot_stats_window,
+        'rules_path': args.rules_path,
+        'parse_workers': args.parse_workers,
+        'monitor_interval': args.monitor_interval,
+        'monitor_workers': args.monitor_workers,
+        'monitor_stats': args.monitor_stats,
+        'stats_stream': args.stats_stream,
+        'io_stats': args.io_stats,
+        'cgroup_path': args.cgroup_path,
+        'runtime': args.runtime
     }
 
     logger.info(f"Got Config: {config}")
 
-    Hubble(config).run()
+    if args.runtime == 'async':
+        # aiohttp is only needed by the asyncio runtime
+        from src.asynchubble import AsyncHubble
+        AsyncHubble(config).run()
+    else:
+        Hubble(config).run()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -0,0 +1,325 @@
+import asyncio
+import json
+import os
+
+from datetime import timezone
+
+import aiohttp
+
+from src.logger import logger
+from src.hubble import Hubble
+from src.nexus import Nexus
+from src.streamparser import StreamParser
+from src.resourcemonitor import ResourceMonitor
+from src.containerstats import ContainerStats
+from src.cursorstore import CursorSkipper
+from src.logreader import LogReader
+from src.discovery import Discovery
+
+
+class DockerAPI:
+    # Just enough of the Docker Engine API for Hubble, spoken over the
+    # daemon's Unix socket with aiohttp so every container shares one loop
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self.session = None
+
+    @staticmethod
+    def socket_from_env():
+        docker_host = os.environ.get('DOCKER_HOST', '')
+        if docker_host.startswith('unix://'):
+            return docker_host[len('unix://'):]
+        return '/var/run/docker.sock'
+
+    async def open(self):
+        self.session = aiohttp.ClientSession(
+            connector=aiohttp.UnixConnector(path=self.socket_path),
+            timeout=aiohttp.ClientTimeout(total=None, sock_connect=10)
+        )
+
+    async def close(self):
+        if self.session:
+            await self.session.close()
+
+    async def get_json(self, path, params=None):
+        async with self.session.get(f"http://docker{path}", params=params, timeout=aiohttp.ClientTimeout(total=60)) as response:
+            response.raise_for_status()
+            return await response.json(content_type=None)
+
+    async def inspect_container(self, container_id):
+        # None once the container is gone
+        try:
+            return await self.get_json(f"/containers/{container_id}/json")
+        except aiohttp.ClientResponseError as e:
+            if e.status == 404:
+                return None
+            raise
+
+    async def stream_logs(self, container_id, since, reader):
+        # Yields the lines LogReader cuts from the raw, possibly multiplexed, stream
+        params = {'follow': '1', 'stdout': '1', 'stderr': '1', 'since': str(max(0, int(since)))}
+
+        async with self.session.get(f"http://docker/containers/{container_id}/logs", params=params) as response:
+            response.raise_for_status()
+
+            while True:
+                data = await response.content.readany()
+                if not data:
+                    break
+
+                for line in reader.feed(data):
+                    yield line
+
+            line = reader.flush()
+            if line:
+                yield line
+
+
+class AsyncHubble(Hubble):
+    # Same work as Hubble, but log streams and resource monitoring run as
+    # tasks on one asyncio loop instead of one OS thread per container.
+    # Nexus delivery, cursor saving and stats reporting keep their single
+    # background threads from Hubble.start_services.
+
+    # Give other containers a turn after this many buffered lines
+    yield_every = 1000
+
+    def __init__(self, config) -> None:
+        super().__init__(config)
+        self.docker_api = DockerAPI(DockerAPI.socket_from_env())
+
+    async def parse_container(self, container_data):
+        container_id = container_data['container_id']
+        container_alias = container_data['container_alias']
+        container_type = container_data['container_type']
+
+        StreamParser.upsert_initial(self.nexus_url, container_id, container_alias, container_type)
+
+        logger.info(f"Starting Stream Parser for {container_alias} of type {container_type}.")
+
+        attrs = await self.docker_api.get_json(f"/containers/{container_id}/json")
+        StreamParser.upsert_attributes(attrs['Config']['Cmd'], self.nexus_url, container_id, container_type)
+
+        while not self.stop_event.is_set():
+            try:
+                attrs = await self.docker_api.get_json(f"/containers/{container_id}/json")
+
+                # Discovery starts a new parser when the container runs again
+                if attrs['State']['Status'] != 'running':
+                    logger.info(f"Stopping Stream Parser for {container_alias}, current status: {attrs['State']['Status']}")
+                    return
+
+                # May ask Nexus for containers without a cursor, keep it off the loop
+                start, cursor = await asyncio.to_thread(StreamParser.get_start, self.cursor_store, self.nexus_url, container_id, container_alias)
+
+                # Far behind: read the history in bulk on a worker thread,
+                # then tail from its end
+                if StreamParser.backfill and StreamParser.backfill.needed(start):
+                    resume = await asyncio.to_thread(StreamParser.backfill.run, self.docker_client, container_data, self.stop_event, self.nexus_url, start, cursor, self.cursor_store)
+                    if resume is None:
+                        return
+                    start, cursor = resume
+
+                skipper = CursorSkipper(cursor)
+
+                if start.tzinfo is None:
+                    start = start.replace(tzinfo=timezone.utc)
+
+                reader = LogReader(not attrs['Config'].get('Tty'), StreamParser.matcher.prefilter)
+
+                count = 0
+                async for log in self.docker_api.stream_logs(container_id, start.timestamp(), reader):
+                    if self.stop_event.is_set():
+                        break
+
+                    StreamParser.process_log(log, self.nexus_url, container_id, container_alias, container_type, skipper, self.cursor_store)
+
+                    # A parse worker that falls behind only pauses this
+                    # container, submit never blocks the loop
+                    while StreamParser.parse_pool and StreamParser.parse_pool.backlogged(container_id):
+                        await asyncio.sleep(StreamParser.parse_pool.pause)
+
+                    # Reading from a full buffer never suspends, so a long
+                    # backlog would otherwise starve every other container
+                    count += 1
+                    if count % self.yield_every == 0:
+                        await asyncio.sleep(0)
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as e:
+                logger.error(f"Error in monitor_stream for container {container_alias}", exc_info=e)
+                await asyncio.sleep(5)
+
+    def start_parser(self, container):
+        # Called by discovery, on the loop, whenever a container starts running
+        if container['container_type'] not in Discovery.parse_types:
+            return
+
+        task = self.parsers.get(container['container_id'])
+        if task and not task.done():
+            return
+
+        self.parsers[container['container_id']] = asyncio.create_task(self.parse_container(container))
+
+    def stop_parser(self, container):
+        # Called by discovery when a container stops or is renamed
+        task = self.parsers.pop(container['container_id'], None)
+        if task:
+            task.cancel()
+
+    async def watch_events(self):
+        # Discovery.watch over aiohttp: follows container events and
+        # resumes from the last event's time after a dropped connection
+        filters = json.dumps({'type': ['container'], 'event': Discovery.actions})
+
+        while not self.stop_event.is_set():
+            try:
+                params = {'since': str(self.discovery.since), 'filters': filters}
+                async with self.docker_api.session.get("http://docker/events", params=params) as response:
+                    response.raise_for_status()
+
+                    while True:
+                        line = await response.content.readline()
+                        if not line:
+                            break
+
+                        event = json.loads(line)
+                        self.discovery.since = event.get('time', self.discovery.since)
+
+                        container_id = event['Actor']['ID']
+                        attrs = None if event['Action'] == 'destroy' else await self.docker_api.inspect_container(container_id)
+                        self.discovery.apply(container_id, attrs)
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as e:
+                logger.error("Error following Docker events:", exc_info=e)
+
+            await asyncio.sleep(5)
+
+    async def follow_stats(self, container_stats):
+        # Long-lived stats subscription, one JSON document per line
+        while not self.stop_event.is_set():
+            try:
+                async with self.docker_api.session.get(f"http://docker/containers/{container_stats.container_id}/stats", params={'stream': '1'}) as response:
+                    response.raise_for_status()
+
+                    while True:
+                        line = await response.content.readline()
+                        if not line:
+                            break
+                        container_stats.update(ContainerStats.counters(json.loads(line)))
+
+            except asyncio.CancelledError:
+                raise
+
+            except Exception as e:
+                logger.error(f"Error streaming stats for container {container_stats.container_id}", exc_info=e)
+
+            await asyncio.sleep(5)
+
+    async def monitor_container(self, container_data, host_name, image_labels, container_stats=None):
+        try:
+            container_id = container_data['container_id']
+            attrs = await self.docker_api.get_json(f"/containers/{container_id}/json")
+
+            usage = container_stats.current_usage(ResourceMonitor.cgroup_reader) if container_stats else None
+            if usage is None:
+                usage = ContainerStats.oneshot(await self.docker_api.get_json(f"/containers/{container_id}/stats", {'stream': '0'}))
+
+            if attrs['Image'] not in image_labels:
+                image = await self.docker_api.get_json(f"/images/{attrs['Image']}/json")
+                image_labels[attrs['Image']] = image['Config'].get('Labels') or {}
+
+            return ResourceMonitor.summarize_container(container_data, host_name, attrs, image_labels[attrs['Image']], usage)
+
+        except Exception as e:
+            logger.error("Error monitoring container:", exc_info=e)
+
+    async def monitor_resources(self):
+        logger.info(f"Starting Resource monitor for {len(self.discovery.snapshot())} containers on Host IP {self.host_ip}.")
+        host = ResourceMonitor.summarize_host(await self.docker_api.get_json('/info'), self.host_ip)
+        Nexus.upsert_entity(self.nexus_url, 'host', host)
+
+        image_labels = {}
+        container_stats = {}
+        # The loop only keeps weak references to tasks
+        followers = {}
+
+        def follow(stats):
+            followers[stats.container_id] = asyncio.create_task(self.follow_stats(stats))
+
+        loop = asyncio.get_running_loop()
+        next_cycle = loop.time()
+
+        while not self.stop_event.is_set():
+            start = loop.time()
+
+            # Containers come and go with discovery
+            containers = self.discovery.snapshot()
+            for stats in ResourceMonitor.sync_stats(container_stats, self.discovery, follow if self.stats_stream else None):
+                task = followers.pop(stats.container_id, None)
+                if task:
+                    task.cancel()
+
+            results = await asyncio.gather(*[
+                self.monitor_container(container_data, host['host_name'], image_labels, container_stats.get(container_data['container_id']))
+                for container_data in containers
+            ])
+
+            failed = 0
+            for container in results:
+                if container:
+                    Nexus.upsert_entity(self.nexus_url, 'container', container, low_value=True)
+                else:
+                    failed += 1
+
+            ResourceMonitor.record_cycle(loop.time() - start, len(containers), failed, self.monitor_interval)
+
+            next_cycle = max(next_cycle + self.monitor_interval, loop.time())
+            await asyncio.sleep(next_cycle - loop.time())
+
+    async def main(self):
+        await self.docker_api.open()
+
+        try:
+            tasks = [asyncio.create_task(self.monitor_resources())]
+
+            # A parser task per running container, then follow Docker
+            # events to start and stop them as containers come and go
+            for container in self.containers:
+                if self.discovery.is_running(container['container_id']):
+                    self.start_parser(container)
+
+            self.discovery.on_start = self.start_parser
+            self.discovery.on_stop = self.stop_parser
+            tasks.append(asyncio.create_task(self.watch_events()))
+
+            await asyncio.gather(*tasks)
+
+        finally:
+            await self.docker_api.close()
+
+    def run(self):
+        threads = []
+
+        try:
+            self.get_containers()
+
+            for container in self.containers:
+                logger.info(container)
+
+            self.cursor_store = self.start_services(threads)
+
+            asyncio.run(self.main())
+
+        except KeyboardInterrupt:
+            print("Stop signal received. Gracefully shutting down monitors.")
+
+        finally:
+            self.stop_event.set()
+            for thread in threads:
+                thread.join()
@@ -0,0 +1,141 @@
+import time
+
+from datetime import datetime, timedelta, timezone
+
+from src.logger import logger
+from src.utils import Utils
+from src.nexus import Nexus, NexusBatcher
+from src.cursorstore import CursorStore, CursorSkipper
+from src.logreader import LogReader
+from src.streamparser import StreamParser
+
+
+class Backfill:
+    # Catch-up mode for a container whose logs were last read more than
+    # max_hours ago, or never. The history up to now is read without
+    # follow, as fast as it can be parsed, then the parser tails live logs
+    # from exactly where the history ended.
+    #
+    # While backfilling, state-only events older than max_hours are
+    # skipped because newer ones supersede them. Everything else goes
+    # through handle_event as usual, but this thread's Nexus writes are
+    # collected in a private NexusBatcher and delivered every batch_size
+    # writes, as bulk requests only if bulk is set (--batch_size > 0),
+    # since Nexus may not have the bulk endpoints. The cursor only moves
+    # once a batch was delivered. If Nexus refuses any write, backfilling
+    # stops and the parser replays the rest line by line from the cursor.
+    def __init__(self, max_hours=1, batch_size=500, bulk=False, report_interval=10):
+        self.max_hours = max_hours
+        self.batch_size = batch_size
+        self.bulk = bulk
+        self.report_interval = report_interval
+
+    def needed(self, start):
+        if start.tzinfo is None:
+            start = start.replace(tzinfo=timezone.utc)
+        return start < datetime.now(timezone.utc) - timedelta(hours=self.max_hours)
+
+    def deliver(self, batcher, stop_event):
+        # Blocks until the batch is delivered, backing off while Nexus is
+        # down. False if Hubble stopped or Nexus refused any of the writes.
+        rejected = batcher.rejected_items
+
+        while not batcher.flush(force=True):
+            batcher.failures += 1
+            delay = batcher.backoff()
+            logger.warning(f"Backfill delivery failed {batcher.failures} times, retrying in {delay:.1f}s")
+            if stop_event.wait(delay):
+                return False
+
+        batcher.failures = 0
+        return batcher.rejected_items == rejected
+
+    def delivered(self, cursor_store, container_id, last):
+        # Moves the cursor to the last delivered line, returns it as the
+        # (start, cursor) to resume from
+        if cursor_store:
+            cursor_store.update(container_id, last[0], last[1])
+        return datetime.fromtimestamp(Utils.to_epoch(last[0]), timezone.utc), (last[0], CursorStore.hash_line(last[1]))
+
+    def stopped(self, stop_event, container_alias, resume):
+        # None if Hubble stopped, otherwise Nexus refused writes and the
+        # rest is replayed from the last delivered line, one write at a time
+        if stop_event.is_set():
+            return None
+
+        logger.warning(f"Nexus refused backfill writes of {container_alias}, replaying its logs from {resume[0]} line by line")
+        return resume
+
+    def run(self, docker_client, container_data, stop_event, nexus_url, start, cursor, cursor_store=None):
+        # Returns the (start, cursor) to tail live logs from, or None if
+        # Hubble stopped before the history was read
+        container_id = container_data['container_id']
+        container_alias = container_data['container_alias']
+        container_type = container_data['container_type']
+
+        container = docker_client.containers.get(container_id)
+        until = datetime.now(timezone.utc).replace(microsecond=0)
+        logger.info(f"Backfilling {container_alias} from {start} to {until}")
+
+        batcher = NexusBatcher(nexus_url, self.batch_size if self.bulk else 0, 0, max_buffer=self.batch_size * 10, spill_path=None)
+        skipper = CursorSkipper(cursor)
+        reader = LogReader(not container.attrs['Config'].get('Tty'), StreamParser.matcher.prefilter)
+        response = LogReader.open_stream(docker_client, container, start, follow=False, until=until)
+
+        events = 0
+        skipped = 0
+        last = None
+        # Where the live parser resumes if Nexus refuses a batch
+        resume = (start, cursor)
+        started = time.monotonic()
+        next_report = started + self.report_interval
+
+        Nexus.local.batcher = batcher
+        try:
+            for log in reader.read(response.raw):
+                if stop_event.is_set():
+                    return None
+
+                try:
+                    parsed_log = StreamParser.parse_log(log.decode('utf-8').strip(), container_alias)
+                    if not parsed_log or skipper.skip(parsed_log[0], log):
+                        continue
+
+                    last = (parsed_log[0], log)
+
+                    event = StreamParser.parse_event(parsed_log, container_id, container_alias, container_type)
+                    if event:
+                        if event.name in StreamParser.state_events and StreamParser.event_age(event) >= self.max_hours:
+                            skipped += 1
+                        else:
+                            events += 1
+                            StreamParser.handle_event(event, nexus_url, container_id, container_alias, container_type)
+
+                except Exception as e:
+                    logger.error(f"Error backfilling container {container_alias}:", exc_info=e)
+
+                if batcher.buffered >= self.batch_size:
+                    if not self.deliver(batcher, stop_event):
+                        return self.stopped(stop_event, container_alias, resume)
+                    if last:
+                        resume = self.delivered(cursor_store, container_id, last)
+
+                now = time.monotonic()
+                if now >= next_report:
+                    next_report = now + self.report_interval
+                    logger.info(f"Backfilling {container_alias}: {reader.lines} lines at {reader.lines / (now - started):.0f} lines/s, {events} events, {skipped} old status events skipped, at {last[0] if last else start}")
+
+            if not self.deliver(batcher, stop_event):
+                return self.stopped(stop_event, container_alias, resume)
+            if last:
+                self.delivered(cursor_store, container_id, last)
+
+        finally:
+            Nexus.local.batcher = None
+            response.close()
+
+        elapsed = time.monotonic() - started
+        logger.info(f"Backfilled {container_alias}: {reader.lines} lines in {elapsed:.1f}s ({reader.lines / max(elapsed, 0.001):.0f} lines/s), {events} events in {batcher.flushed_batches} requests, {skipped} old status events skipped")
+
+        # The history ended right before until, live logs start there
+        return until, None
@@ -0,0 +1,175 @@
+import os
+import time
+
+from src.logger import logger
+
+
+class CgroupReader:
+    # Reads a container's cumulative counters straight from the host's
+    # cgroupfs, a few small file reads instead of a Docker API round trip.
+    # The counters have the same keys as ContainerStats.counters. cgroupfs
+    # has no system wide CPU counter and no network counters, those are
+    # left as None.
+
+    # Where Docker puts a container's cgroup with the systemd and the
+    # cgroupfs cgroup drivers
+    candidates = ['system.slice/docker-{0}.scope', 'docker/{0}']
+
+    def __init__(self, root='/sys/fs/cgroup'):
+        self.root = root
+        self.version = CgroupReader.detect(root)
+        self.online_cpus = os.cpu_count()
+        self.host_memory = CgroupReader.get_host_memory()
+        self.paths = {}
+
+    @staticmethod
+    def detect(root):
+        # cgroup v2 has one unified hierarchy, v1 one directory per controller
+        if os.path.exists(os.path.join(root, 'cgroup.controllers')):
+            return 2
+        if os.path.isdir(os.path.join(root, 'cpuacct')) and os.path.isdir(os.path.join(root, 'memory')):
+            return 1
+        return None
+
+    @staticmethod
+    def get_host_memory():
+        try:
+            with open('/proc/meminfo') as f:
+                for line in f:
+                    if line.startswith('MemTotal:'):
+                        return int(line.split()[1]) * 1024
+        except OSError:
+            pass
+
+        return None
+
+    @staticmethod
+    def read_int(path):
+        with open(path) as f:
+            return int(f.read())
+
+    @staticmethod
+    def read_keyed(path):
+        # Files of "key value" lines, like cpu.stat and memory.stat
+        values = {}
+        with open(path) as f:
+            for line in f:
+                key, _, value = line.partition(' ')
+                values[key] = int(value)
+        return values
+
+    def find(self, container_id):
+        # The container's cgroup directory, relative to the root on v2 and
+        # to each controller on v1
+        path = self.paths.get(container_id)
+        if path:
+            return path
+
+        base = self.root if self.version == 2 else os.path.join(self.root, 'cpuacct')
+        for candidate in CgroupReader.candidates:
+            path = candidate.format(container_id)
+            if os.path.isdir(os.path.join(base, path)):
+                self.paths[container_id] = path
+                return path
+
+        return None
+
+    def counters(self, container_id):
+        # None if the container's cgroup is not visible, the caller then
+        # falls back to the Docker stats API
+        if not self.version:
+            return None
+
+        path = self.find(container_id)
+        if not path:
+            return None
+
+        try:
+            if self.version == 2:
+                return self.read_v2(os.path.join(self.root, path))
+            return self.read_v1(path)
+
+        except (OSError, ValueError, KeyError) as e:
+            # Gone with the container, or recreated by a restart
+            self.paths.pop(container_id, None)
+            logger.debug(f"Could not read cgroup of container {container_id}: {e}")
+            return None
+
+    def memory_limit(self, limit):
+        # Docker reports the host's memory for containers without a limit
+        if limit is None or (self.host_memory and limit > self.host_memory):
+            return self.host_memory
+        return limit
+
+    def read_v2(self, path):
+        sampled_at = time.monotonic()
+        cpu = CgroupReader.read_keyed(os.path.join(path, 'cpu.stat'))['usage_usec'] * 1000
+        memory = CgroupReader.read_keyed(os.path.join(path, 'memory.stat'))
+        memory_current = CgroupReader.read_int(os.path.join(path, 'memory.current'))
+
+        with open(os.path.join(path, 'memory.max')) as f:
+            value = f.read().strip()
+            limit = None if value == 'max' else int(value)
+
+        # One line per device: "8:0 rbytes=1 wbytes=2 rios=3 wios=4 ..."
+        blk_read = blk_write = None
+        io_path = os.path.join(path, 'io.stat')
+        if os.path.exists(io_path):
+            blk_read = blk_write = 0
+            with open(io_path) as f:
+                for line in f:
+                    for field in line.split()[1:]:
+                        key, _, value = field.partition('=')
+                        if key == 'rbytes':
+                            blk_read += int(value)
+                        elif key == 'wbytes':
+                            blk_write += int(value)
+
+        return {
+            'time': sampled_at,
+            'cpu': cpu,
+            'system_cpu': None,
+            'online_cpus': self.online_cpus,
+            'mem_used': memory_current - memory.get('inactive_file', 0),
+            'mem_limit': self.memory_limit(limit),
+            'blk_read': blk_read,
+            'blk_write': blk_write,
+            'net_rx': None,
+            'net_tx': None,
+        }
+
+    def read_v1(self, path):
+        sampled_at = time.monotonic()
+        cpu = CgroupReader.read_int(os.path.join(self.root, 'cpuacct', path, 'cpuacct.usage'))
+        memory_path = os.path.join(self.root, 'memory', path)
+        memory = CgroupReader.read_keyed(os.path.join(memory_path, 'memory.stat'))
+        memory_usage = CgroupReader.read_int(os.path.join(memory_path, 'memory.usage_in_bytes'))
+        limit = CgroupReader.read_int(os.path.join(memory_path, 'memory.limit_in_bytes'))
+
+        # "8:0 Read 123" lines per device and operation, then a "Total" line
+        blk_read = blk_write = None
+        io_path = os.path.join(self.root, 'blkio', path, 'blkio.throttle.io_service_bytes_recursive')
+        if os.path.exists(io_path):
+            blk_read = blk_write = 0
+            with open(io_path) as f:
+                for line in f:
+                    fields = line.split()
+                    if len(fields) != 3:
+                        continue
+                    if fields[1] == 'Read':
+                        blk_read += int(fields[2])
+                    elif fields[1] == 'Write':
+                        blk_write += int(fields[2])
+
+        return {
+            'time': sampled_at,
+            'cpu': cpu,
+            'system_cpu': None,
+            'online_cpus': self.online_cpus,
+            'mem_used': memory_usage - memory.get('total_inactive_file', 0),
+            'mem_limit': self.memory_limit(limit),
+            'blk_read': blk_read,
+            'blk_write': blk_write,
+            'net_rx': None,
+            'net_tx': None,
+        }
@@ -0,0 +1,79 @@
+import threading
+
+from src.logger import logger
+from src.nexus import Nexus
+
+
+class Coalescer:
+    # Holds back the upserts of high-frequency status events and only
+    # sends the newest one per (container_id, event_name, farm_index)
+    # every window seconds. Only upserts of events routed with 'coalesce'
+    # are added here, inserts of rewards, claims and plots never are. Any
+    # other upsert of the same container and entity flushes what is held
+    # first, so a held back status can never land after a newer write of
+    # that entity.
+
+    def __init__(self, nexus_url, window=5.0):
+        self.nexus_url = nexus_url
+        self.window = window
+        self.lock = threading.Lock()
+        # container_id -> {(event_name, farm_index): (entity, item, low_value)}
+        self.pending = {}
+        # container_id -> lock held from taking its upserts until they are
+        # sent, so a flush for a newer write waits for a flush in progress
+        self.send_locks = {}
+        self.received = 0
+        self.sent = 0
+
+    def add(self, event, entity, item, low_value=False):
+        container_id = event.data['container_id']
+        key = (event.name, event.data.get('farm_index'))
+
+        with self.lock:
+            self.received += 1
+            self.send_locks.setdefault(container_id, threading.Lock())
+            upserts = self.pending.setdefault(container_id, {})
+            # Re-inserted at the end, flush sends in order of the latest
+            # arrival, so Idle after Syncing in one window ends as Idle
+            upserts.pop(key, None)
+            upserts[key] = (entity, item, low_value)
+
+    def flush(self, container_id=None, entity=None):
+        # Everything, or only what one container holds for one entity
+        if container_id is None:
+            with self.lock:
+                container_ids = list(self.pending)
+            for held_container_id in container_ids:
+                self.flush_container(held_container_id, None)
+        else:
+            self.flush_container(container_id, entity)
+
+    def flush_container(self, container_id, entity):
+        with self.lock:
+            send_lock = self.send_locks.get(container_id)
+            if send_lock is None:
+                return
+
+        with send_lock:
+            with self.lock:
+                upserts = self.pending.get(container_id)
+                if not upserts:
+                    return
+                keys = [key for key, upsert in upserts.items() if entity is None or upsert[0] == entity]
+                held = [upserts.pop(key) for key in keys]
+                if not upserts:
+                    del self.pending[container_id]
+
+                self.sent += len(held)
+
+            for held_entity, item, low_value in held:
+                Nexus.upsert_entity(self.nexus_url, held_entity, item, low_value=low_value)
+
+    def start_flush(self, stop_event):
+        logger.info(f"Coalescing status upserts every {self.window}s")
+
+        while not stop_event.wait(self.window):
+            self.flush()
+
+        self.flush()
+        logger.info(f"Coalescer stopped: {self.received} status upserts sent as {self.sent}")
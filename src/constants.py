@@ -18,7 +18,7 @@ farmer_statuses = [
 
 key_events = [
     {
-        'event_name': 'Connecting to node RPC url',                    
+        'event_name': 'Register RPC URL',                              
         'event_type': 'farmer',     
         'event_subtype': 'controller',      
         'event_description': 'Farmer is connecting to the Node via the RPC URL',
@@ -50,6 +50,30 @@ key_events = [
         'event_subtype': 'farmer',          
         'event_description': 'The Farmer has finished checking plot cache contents'
     },
+    {
+        'event_name': 'Downloading Segment Headers',                   
+        'event_type': 'farmer',     
+        'event_subtype': 'controller',      
+        'event_description': 'Farmer is downloading all segment headers from the Node'
+    },
+    {
+        'event_name': 'Downloaded All Segment Headers',                
+        'event_type': 'farmer',     
+        'event_subtype': 'controller',      
+        'event_description': 'Farmer has downloaded all segment headers from the Node'
+    },
+    {
+        'event_name': 'NATs Connected',                                
+        'event_type': 'farmer',     
+        'event_subtype': 'controller',      
+        'event_description': 'Cluster component is connected to NATS'
+    },
+    {
+        'event_name': 'NATs Disconnected',                             
+        'event_type': 'farmer',     
+        'event_subtype': 'controller',      
+        'event_description': 'Cluster component is disconnected from NATS'
+    },
     {
         'event_name': 'Benchmarking Proving Method',                   
         'event_type': 'farmer',     
@@ -237,9 +261,21 @@ key_events = [
         'event_description': 'Node is in a pending state'
     },
     {
-        'event_name': 'Claimed',                                       
+        'event_name': 'Claim',                                         
         'event_type': 'node',       
         'event_subtype': 'node',            
         'event_description': 'Node has claimed a reward'
+    },
+    {
+        'event_name': 'Imported',                                      
+        'event_type': 'node',       
+        'event_subtype': 'node',            
+        'event_description': 'Node has imported a block'
+    },
+    {
+        'event_name': 'Reorg',                                         
+        'event_type': 'node',       
+        'event_subtype': 'node',            
+        'event_description': 'Node has reorganized its chain'
     }
 ]
\ No newline at end of file
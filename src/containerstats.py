@@ -0,0 +1,152 @@
+import threading
+import time
+
+from src.logger import logger
+
+
+class ContainerStats:
+    # Resource usage of one container, computed locally from two samples of
+    # its cumulative counters instead of from Docker's precpu_stats. The
+    # counters come from a long-lived stats stream, a one-shot stats call
+    # or, with a cgroupfs reader, straight from the kernel.
+    def __init__(self, container_id):
+        self.container_id = container_id
+        self.lock = threading.Lock()
+        self.previous = None
+        self.usage = None
+        # Sampled from cgroupfs on every cycle instead of by a stream
+        self.from_cgroup = False
+        # Set once the container stopped or went away
+        self.stopped = threading.Event()
+
+    @staticmethod
+    def counters(stats, sampled_at=None):
+        # Cumulative counters from a Docker stats document, on cgroup v1 or v2
+        cpu_stats = stats.get('cpu_stats') or {}
+        cpu_usage = cpu_stats.get('cpu_usage') or {}
+        memory_stats = stats.get('memory_stats') or {}
+        memory = memory_stats.get('stats') or {}
+
+        # Same as docker stats: page cache that can be reclaimed is not
+        # counted. cgroup v1 calls it total_inactive_file, v2 inactive_file.
+        if 'total_inactive_file' in memory:
+            cache = memory['total_inactive_file']
+        else:
+            cache = memory.get('inactive_file', 0)
+
+        blkio = (stats.get('blkio_stats') or {}).get('io_service_bytes_recursive') or []
+        networks = (stats.get('networks') or {}).values()
+
+        return {
+            'time': sampled_at if sampled_at is not None else time.monotonic(),
+            'cpu': cpu_usage.get('total_usage'),
+            'system_cpu': cpu_stats.get('system_cpu_usage'),
+            'online_cpus': cpu_stats.get('online_cpus') or len(cpu_usage.get('percpu_usage') or []) or None,
+            'mem_used': memory_stats['usage'] - cache if 'usage' in memory_stats else None,
+            'mem_limit': memory_stats.get('limit'),
+            'blk_read': sum(entry['value'] for entry in blkio if entry['op'].lower() == 'read'),
+            'blk_write': sum(entry['value'] for entry in blkio if entry['op'].lower() == 'write'),
+            'net_rx': sum(network.get('rx_bytes', 0) for network in networks),
+            'net_tx': sum(network.get('tx_bytes', 0) for network in networks),
+        }
+
+    @staticmethod
+    def rate(previous, current, key, elapsed):
+        if previous[key] is None or current[key] is None or elapsed <= 0:
+            return None
+        # A counter that went backwards was reset, e.g. by a restart
+        return round(max(0, current[key] - previous[key]) / elapsed, 1)
+
+    @staticmethod
+    def usage_between(previous, current):
+        elapsed = current['time'] - previous['time']
+
+        # CPU as a share of the whole host, like the previous precpu based
+        # figure. Without a system counter, e.g. from cgroupfs, the host's
+        # CPU time is the elapsed time on every online CPU.
+        cpu_pct = None
+        if current['cpu'] is not None and previous['cpu'] is not None:
+            if current['system_cpu'] is not None and previous['system_cpu'] is not None:
+                system_delta = current['system_cpu'] - previous['system_cpu']
+            else:
+                system_delta = elapsed * 1e9 * (current['online_cpus'] or 1)
+
+            if system_delta > 0:
+                cpu_pct = round(max(0, current['cpu'] - previous['cpu']) / system_delta * 100, 3)
+
+        mem_pct = None
+        if current['mem_used'] is not None and current['mem_limit']:
+            mem_pct = round(current['mem_used'] / current['mem_limit'] * 100, 3)
+
+        return {
+            'cpu_pct': cpu_pct,
+            'mem_pct': mem_pct,
+            'blk_read_bps': ContainerStats.rate(previous, current, 'blk_read', elapsed),
+            'blk_write_bps': ContainerStats.rate(previous, current, 'blk_write', elapsed),
+            'net_rx_bps': ContainerStats.rate(previous, current, 'net_rx', elapsed),
+            'net_tx_bps': ContainerStats.rate(previous, current, 'net_tx', elapsed),
+        }
+
+    @staticmethod
+    def oneshot(stats):
+        # Usage from a single stats document, using Docker's precpu sample
+        # as the previous one. There is no previous I/O sample.
+        current = ContainerStats.counters(stats)
+        previous = dict(current)
+        precpu = stats.get('precpu_stats') or {}
+        previous['cpu'] = (precpu.get('cpu_usage') or {}).get('total_usage')
+        previous['system_cpu'] = precpu.get('system_cpu_usage')
+
+        usage = ContainerStats.usage_between(previous, current)
+        for key in ['blk_read_bps', 'blk_write_bps', 'net_rx_bps', 'net_tx_bps']:
+            usage[key] = None
+        return usage
+
+    def update(self, counters):
+        with self.lock:
+            if self.previous:
+                self.usage = ContainerStats.usage_between(self.previous, counters)
+            self.previous = counters
+
+    def get_usage(self):
+        with self.lock:
+            return self.usage
+
+    def sample(self, cgroup_reader):
+        # False if the container's cgroup could not be read
+        counters = cgroup_reader.counters(self.container_id)
+        if counters is None:
+            return False
+
+        self.update(counters)
+        return True
+
+    def current_usage(self, cgroup_reader=None):
+        # Usage since the previous cycle for cgroupfs, the latest streamed
+        # usage otherwise. None means fall back to a one-shot stats call.
+        if self.from_cgroup and not self.sample(cgroup_reader):
+            return None
+
+        return self.get_usage()
+
+    def stop(self):
+        self.stopped.set()
+
+    def follow(self, docker_client, stop_event):
+        # Keeps one stats(stream=True) subscription open, Docker sends a
+        # sample about every second. Reconnects if the stream ends, until
+        # Hubble stops or the container does.
+        while not stop_event.is_set() and not self.stopped.is_set():
+            try:
+                container = docker_client.containers.get(self.container_id)
+                for stats in container.stats(stream=True, decode=True):
+                    if stop_event.is_set() or self.stopped.is_set():
+                        return
+                    self.update(ContainerStats.counters(stats))
+
+            except Exception as e:
+                if self.stopped.is_set():
+                    return
+                logger.error(f"Error streaming stats for container {self.container_id}", exc_info=e)
+
+            self.stopped.wait(5)
@@ -0,0 +1,109 @@
+import hashlib
+import os
+import sqlite3
+import threading
+
+from src.logger import logger
+
+
+class CursorStore:
+    # Where each container's log stream was last read up to: the timestamp
+    # of the last processed line ('%Y-%m-%d %H:%M:%S', as produced by
+    # Utils.normalize_date) and a hash of that line. Parser threads
+    # only update an in-memory dict per line; a background thread writes
+    # the changed cursors to SQLite every flush_interval seconds.
+    def __init__(self, path, flush_interval=5.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.lock = threading.Lock()
+        self.dirty = {}
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute(
+            'CREATE TABLE IF NOT EXISTS cursors ('
+            'container_id TEXT PRIMARY KEY, log_datetime TEXT NOT NULL, line_hash TEXT NOT NULL)'
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def hash_line(line):
+        return hashlib.blake2b(line, digest_size=8).hexdigest()
+
+    def get(self, container_id):
+        # Returns (log_datetime, line_hash) or None if the container was
+        # never read before
+        with self.lock:
+            pending = self.dirty.get(container_id)
+            if pending:
+                return pending[0], CursorStore.hash_line(pending[1])
+
+            row = self.connection.execute(
+                'SELECT log_datetime, line_hash FROM cursors WHERE container_id = ?', (container_id,)
+            ).fetchone()
+
+        return tuple(row) if row else None
+
+    def update(self, container_id, log_datetime, line):
+        # Called for every processed line, hashing is deferred to the flush
+        with self.lock:
+            self.dirty[container_id] = (log_datetime, line)
+
+    def flush(self):
+        with self.lock:
+            dirty, self.dirty = self.dirty, {}
+            if not dirty:
+                return
+
+            rows = [
+                (container_id, log_datetime, CursorStore.hash_line(line))
+                for container_id, (log_datetime, line) in dirty.items()
+            ]
+            try:
+                self.connection.executemany(
+                    'INSERT INTO cursors (container_id, log_datetime, line_hash) VALUES (?, ?, ?) '
+                    'ON CONFLICT(container_id) DO UPDATE SET log_datetime = excluded.log_datetime, line_hash = excluded.line_hash',
+                    rows
+                )
+                self.connection.commit()
+            except sqlite3.Error as e:
+                logger.error(f"Error saving log cursors to {self.path}", exc_info=e)
+                for container_id, value in dirty.items():
+                    self.dirty.setdefault(container_id, value)
+
+    def start_flush(self, stop_event):
+        while not stop_event.wait(self.flush_interval):
+            self.flush()
+
+        self.flush()
+        self.connection.close()
+
+
+class CursorSkipper:
+    # Docker's 'since' only has one second resolution, so a resumed stream
+    # replays lines that were already processed. Drops lines up to and
+    # including the cursor line, then passes everything through.
+    def __init__(self, cursor):
+        self.active = cursor is not None
+        if self.active:
+            self.log_datetime, self.line_hash = cursor
+
+    def skip(self, log_datetime, line):
+        if not self.active:
+            return False
+
+        if log_datetime < self.log_datetime:
+            return True
+
+        if log_datetime == self.log_datetime:
+            # Same timestamp as the cursor, skip until the cursor line itself
+            if CursorStore.hash_line(line) == self.line_hash:
+                self.active = False
+            return True
+
+        self.active = False
+        return False
@@ -0,0 +1,124 @@
+import json
+import os
+import threading
+import time
+
+from datetime import datetime, timezone
+
+from src.logger import logger
+
+
+class DeadLetter:
+    # Log lines that could not be turned into an event, e.g. after a
+    # Subspace upgrade changed a message, together with the rule that
+    # failed. Every line is counted per rule. Only max_per_minute lines per
+    # rule and minute are written to path as JSON lines, so a format change
+    # cannot flood the disk. Without a path lines are only counted.
+    def __init__(self, path='./spool/deadletter.jsonl', max_per_minute=60, max_mb=100, collect=False):
+        self.path = path
+        self.max_per_minute = max_per_minute
+        self.max_bytes = max_mb * 1024 ** 2
+        # Hold lines for take() instead, used in parse worker processes
+        self.collect = collect
+        self.collected = []
+        self.lock = threading.Lock()
+        self.file = None
+
+        # rule -> [lines, lines at the last get_stats]
+        self.counts = {}
+        # rule -> [minute started, lines written in it]
+        self.windows = {}
+        self.written = 0
+        self.suppressed = 0
+        self.reported_at = time.monotonic()
+
+    def add(self, rule_name, reason, container_alias, data, error=None):
+        if self.collect:
+            self.collected.append((rule_name, reason, container_alias, data, error))
+            return
+
+        with self.lock:
+            count = self.counts.setdefault(rule_name, [0, 0])
+            count[0] += 1
+            if count[0] == 1:
+                logger.warning(f"{rule_name}: {reason} for a line of {container_alias}, now collecting these in {self.path or 'counters only'}")
+
+            if not self.path:
+                return
+
+            now = time.monotonic()
+            window = self.windows.get(rule_name)
+            if window is None or now - window[0] >= 60:
+                window = self.windows[rule_name] = [now, 0]
+
+            if window[1] >= self.max_per_minute:
+                self.suppressed += 1
+                return
+            window[1] += 1
+
+            record = {
+                'time': datetime.now(timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+                'container': container_alias,
+                'rule': rule_name,
+                'reason': reason,
+                'data': data,
+                'error': error,
+            }
+
+            try:
+                self.write(json.dumps(record, default=str) + '\n')
+                self.written += 1
+            except OSError as e:
+                logger.error(f"Could not write dead-letter file {self.path}", exc_info=e)
+
+    def write(self, line):
+        if self.file is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self.file = open(self.path, 'a', encoding='utf-8')
+
+        self.file.write(line)
+        self.file.flush()
+
+        # Keep one previous file, so the disk use stays at twice max_mb
+        if self.file.tell() >= self.max_bytes:
+            self.file.close()
+            os.replace(self.path, self.path + '.1')
+            self.file = None
+
+    def take(self):
+        collected = self.collected
+        self.collected = []
+        return collected
+
+    def get_stats(self):
+        # Rules with new lines since the previous call, and their rate
+        with self.lock:
+            now = time.monotonic()
+            elapsed = max(now - self.reported_at, 0.001)
+            self.reported_at = now
+
+            rows = []
+            for rule_name, count in self.counts.items():
+                lines = count[0] - count[1]
+                count[1] = count[0]
+                if lines:
+                    rows.append({'rule': rule_name, 'lines': lines, 'per_minute': round(lines * 60 / elapsed, 1), 'total': count[0]})
+
+        return sorted(rows, key=lambda row: row['lines'], reverse=True)
+
+    def report_stats(self, stop_event, interval):
+        # Without an interval only the final counts are logged
+        while not stop_event.wait(interval or None):
+            for row in self.get_stats():
+                logger.warning(f"Dead-letter stats: {row}")
+
+        self.close()
+        logger.info(f"Dead-letter lines: {self.written} written, {self.suppressed} over the rate limit")
+
+    def close(self):
+        with self.lock:
+            if self.file:
+                self.file.close()
+                self.file = None
@@ -0,0 +1,161 @@
+import threading
+import time
+
+import docker
+
+from src.logger import logger
+
+
+class Discovery:
+    # Live registry of the Subspace containers on this host. It is loaded
+    # once at startup and then kept current from the Docker events API, so
+    # containers created, recreated, renamed or removed later are picked up
+    # without a restart or a rescan. on_start and on_stop are called with
+    # the container's data when it starts or stops running, which is where
+    # the runtimes start and stop its parser.
+
+    # Container events that change the registry
+    actions = ['start', 'die', 'destroy', 'rename']
+
+    # Container types whose logs are parsed
+    parse_types = ['node', 'farmer', 'cluster_farmer', 'cluster_cache', 'cluster_plotter', 'cluster_controller']
+
+    def __init__(self, on_start=None, on_stop=None):
+        self.on_start = on_start
+        self.on_stop = on_stop
+        self.lock = threading.Lock()
+        # container_id -> container data, and the ids of the running ones
+        self.containers = {}
+        self.running = set()
+        # Unix time events are read from, set by load and by every event
+        self.since = None
+        self.stream = None
+
+    @staticmethod
+    def get_container_type(command):
+        if 'cache' in command and 'cluster' in command:
+            container_type = 'cluster_cache'
+        elif 'controller' in command and 'cluster' in command:
+            container_type = 'cluster_controller'
+        elif 'farmer' in command and 'cluster' in command:
+            container_type = 'cluster_farmer'
+        elif 'plotter' in command and 'cluster' in command:
+            container_type = 'cluster_plotter'
+        else:
+            container_type = 'farmer'
+
+        return container_type
+
+    @staticmethod
+    def describe(attrs):
+        # Container data from an inspect document, None if it is not a
+        # Subspace node or farmer. The image is matched on the reference
+        # the container was created from, which needs no image inspect.
+        image = attrs['Config'].get('Image') or ''
+
+        if 'subspace/node' in image:
+            container_type = 'node'
+        elif 'subspace/farmer' in image:
+            container_type = Discovery.get_container_type(attrs['Config']['Cmd'])
+        else:
+            return None
+
+        container_name = attrs['Name'].lstrip('/')
+        container_label = (attrs['Config'].get('Labels') or {}).get('com.subspace.name')
+        return {
+            'container_type': container_type,
+            'container_id': attrs['Id'],
+            'container_name': container_name,
+            'container_label': container_label,
+            'container_alias': container_label if container_label else container_name
+        }
+
+    def snapshot(self):
+        with self.lock:
+            return list(self.containers.values())
+
+    def is_running(self, container_id):
+        with self.lock:
+            return container_id in self.running
+
+    def apply(self, container_id, attrs):
+        # Brings one container up to date from its inspect document, None
+        # once it is gone. Safe to repeat, events replayed after a
+        # reconnect change nothing.
+        container_data = Discovery.describe(attrs) if attrs else None
+
+        with self.lock:
+            previous = self.containers.get(container_id)
+            was_running = container_id in self.running
+            running = bool(container_data and attrs['State'].get('Running'))
+            # A rename changes the alias events are reported under
+            renamed = bool(previous and container_data and previous['container_name'] != container_data['container_name'])
+
+            if container_data:
+                self.containers[container_id] = container_data
+            else:
+                self.containers.pop(container_id, None)
+
+            if running:
+                self.running.add(container_id)
+            else:
+                self.running.discard(container_id)
+
+        if container_data and not previous:
+            logger.info(f"Discovered container {container_data}")
+        elif previous and not container_data:
+            logger.info(f"Container {previous['container_alias']} was removed")
+
+        if was_running and (not running or renamed) and self.on_stop:
+            self.on_stop(previous)
+        if running and (not was_running or renamed) and self.on_start:
+            self.on_start(container_data)
+
+    def load(self, docker_client):
+        # Events from before the listing are replayed by watch, apply
+        # makes that harmless
+        self.since = int(time.time())
+
+        for container in docker_client.containers.list(all=True):
+            self.apply(container.id, container.attrs)
+
+    def handle(self, docker_client, event):
+        container_id = event['Actor']['ID']
+        self.since = event.get('time', self.since)
+
+        attrs = None
+        if event['Action'] != 'destroy':
+            try:
+                attrs = docker_client.api.inspect_container(container_id)
+            except docker.errors.NotFound:
+                pass
+
+        self.apply(container_id, attrs)
+
+    def watch(self, docker_client, stop_event):
+        # Follows container events until stop_event is set. A dropped
+        # connection resumes from the last event's time.
+        while not stop_event.is_set():
+            try:
+                self.stream = docker_client.events(
+                    since=self.since,
+                    filters={'type': 'container', 'event': Discovery.actions},
+                    decode=True
+                )
+
+                for event in self.stream:
+                    if stop_event.is_set():
+                        return
+                    self.handle(docker_client, event)
+
+            except Exception as e:
+                if stop_event.is_set():
+                    return
+                logger.error("Error following Docker events:", exc_info=e)
+
+            stop_event.wait(5)
+
+    def close(self):
+        # Ends a blocking watch
+        if self.stream:
+            self.stream.close()
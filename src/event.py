@@ -0,0 +1,35 @@
+class Event:
+    # One parsed log event on its way through the parser. A slotted object
+    # is about a third of the size of the equivalent dict and is only
+    # created for lines that matched a rule or are not INFO. It becomes the
+    # dict Nexus expects in to_dict, when it is handed to Nexus.
+    __slots__ = ('name', 'type', 'container_type', 'container_alias', 'level', 'source', 'datetime', 'data')
+
+    def __init__(self, name, type, container_type, container_alias, level, source, datetime, data):
+        self.name = name
+        self.type = type
+        self.container_type = container_type
+        self.container_alias = container_alias
+        self.level = level
+        self.source = source
+        self.datetime = datetime
+        self.data = data
+
+    def to_dict(self):
+        return {
+            'event_name': self.name,
+            'event_type': self.type,
+            'event_container_type': self.container_type,
+            'event_container_alias': self.container_alias,
+            'event_level': self.level,
+            'event_source': self.source,
+            'event_datetime': self.datetime,
+            'event_data': self.data,
+        }
+
+    def copy(self):
+        # event_data is changed by handle_event, the copy gets its own
+        return Event(self.name, self.type, self.container_type, self.container_alias, self.level, self.source, self.datetime, dict(self.data))
+
+    def __repr__(self):
+        return repr(self.to_dict())
@@ -0,0 +1,171 @@
+import re
+
+from src.patterns import Patterns
+from src.prefilter import Prefilter
+
+
+class EventMatcher:
+    def __init__(self, rules, converters=None, transforms=None, discarded=None):
+        self.rules = rules
+        self.converters = {
+            'str': None,
+            'int': int,
+            'float': float,
+            'optional_float': EventMatcher.optional_float
+        }
+        self.converters.update(converters or {})
+        self.transforms = transforms or {}
+
+        # Later rules take precedence over earlier ones, so remember each
+        # rule's position together with the keyword that triggers it
+        self.rules_by_trigger = {}
+
+        for priority, rule in enumerate(rules):
+            try:
+                candidate = (priority, rule, self.build_plan(rule))
+                self.rules_by_trigger.setdefault(rule['trigger'], []).append(candidate)
+            except (KeyError, TypeError, ValueError, AttributeError, re.error) as e:
+                raise ValueError(f"Invalid event rule {rule.get('event_name', priority)!r}: {e!r}")
+
+        # Highest priority first, so the first candidate that passes its
+        # 'requires' check is the one to use for that keyword
+        for candidates in self.rules_by_trigger.values():
+            candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+
+        # One alternation over every trigger keyword. Longer keywords come
+        # first so 'Plotting sector retry sector_index' wins over
+        # 'Plotting sector' when both start at the same position.
+        keywords = sorted(self.rules_by_trigger, key=len, reverse=True)
+        self.trigger_pattern = Patterns.register('event_triggers', '|'.join(re.escape(keyword) for keyword in keywords))
+
+        # Lines whose only triggers belong to discarded events never reach
+        # the parser
+        discarded = discarded or []
+        self.prefilter = Prefilter([
+            keyword for keyword in keywords
+            if any(candidate[1]['event_name'] not in discarded for candidate in self.rules_by_trigger[keyword])
+        ])
+
+    @staticmethod
+    def optional_float(value):
+        return float(value) if value else None
+
+    def build_plan(self, rule):
+        # Resolve field groups and converters once so extraction is a
+        # single match.group() call plus the conversions that are needed.
+        # A string where a list belongs would be iterated per character.
+        if not EventMatcher.is_string_list(rule.get('requires', [])):
+            raise ValueError("'requires' is not a list of strings")
+        if not EventMatcher.is_string_list(rule.get('samples')) or not rule['samples']:
+            raise ValueError("a rule needs a list of sample lines")
+        if not isinstance(rule.get('patterns', []), list):
+            raise ValueError("'patterns' is not a list")
+
+        patterns = []
+        for index, spec in enumerate(rule.get('patterns', [])):
+            name = f"{rule['event_name']}:{index}"
+            if not isinstance(spec['pattern'], str):
+                raise ValueError(f"pattern {index} is not a string")
+            compiled = Patterns.register(name, spec['pattern'])
+            fields = tuple(spec['fields'])
+            groups = tuple(group for group, _ in spec['fields'].values())
+            converters = tuple(self.converters[value_type] for _, value_type in spec['fields'].values())
+            patterns.append((name, compiled, fields, groups, converters, spec.get('optional', False), spec.get('default')))
+
+        transform = self.transforms[rule['transform']] if rule.get('transform') else None
+
+        return (rule.get('data', {}), tuple(patterns), transform)
+
+    @staticmethod
+    def is_string_list(value):
+        return isinstance(value, list) and all(isinstance(item, str) for item in value)
+
+    def match(self, text):
+        # Scan the line once for every trigger it contains, then pick the
+        # matching rule with the highest priority. Most lines hit zero or
+        # one trigger, so this is usually a single dictionary lookup.
+        if Patterns.stats_enabled:
+            found = Patterns.call('event_triggers', self.trigger_pattern.findall, text)
+        else:
+            found = self.trigger_pattern.findall(text)
+
+        if not found:
+            return None
+
+        best = None
+
+        for keyword in found:
+            for candidate in self.rules_by_trigger[keyword]:
+                if best and candidate[0] <= best[0]:
+                    break
+
+                requires = candidate[1].get('requires')
+                if requires and not all(required in text for required in requires):
+                    continue
+
+                best = candidate
+                break
+
+        return best
+
+    def extract(self, candidate, text):
+        data, patterns, transform = candidate[2]
+        event_data = dict(data)
+
+        for name, compiled, fields, groups, converters, optional, default in patterns:
+            if Patterns.stats_enabled:
+                match = Patterns.call(name, compiled.search, text)
+            else:
+                match = compiled.search(text)
+
+            if not match:
+                if not optional:
+                    return None
+
+                for field in fields:
+                    event_data[field] = default
+                continue
+
+            values = match.group(*groups)
+            if len(groups) == 1:
+                values = (values,)
+
+            for field, value, converter in zip(fields, values, converters):
+                event_data[field] = converter(value) if converter else value
+
+        if transform:
+            event_data = transform(event_data, text)
+
+        return event_data
+
+    def parse(self, text):
+        # Returns the matching rule and its extracted fields. The fields are
+        # None when a rule matched but one of its required patterns did not.
+        candidate = self.match(text)
+        if not candidate:
+            return None, None
+
+        return candidate[1], self.extract(candidate, text)
+
+    def check_samples(self):
+        # Every sample line of a rule has to come out as that rule's event,
+        # so a pattern that no longer fits is refused when the rules load
+        errors = []
+
+        for rule in self.rules:
+            for sample in rule.get('samples', []):
+                match = Patterns.compiled['log_line'].match(sample)
+                text = match.group('data') if match else sample
+
+                try:
+                    found, event_data = self.parse(text)
+                except Exception as e:
+                    errors.append(f"{rule['event_name']}: {e!r} for sample {sample!r}")
+                    continue
+
+                if found is not rule:
+                    errors.append(f"{rule['event_name']}: sample is parsed as {found['event_name'] if found else 'no event'}: {sample!r}")
+                elif event_data is None:
+                    errors.append(f"{rule['event_name']}: a pattern does not match sample {sample!r}")
+
+        return errors
@@ -0,0 +1,60 @@
+class EventRouter:
+    # Looks up what handle_event writes to Nexus for an event, see
+    # event_routes in src/rules.py. Each route is resolved once into a
+    # tuple, so dispatch is a single dictionary lookup.
+    upserts = ['container', 'event_type']
+    inserts = ['plot', 'reward', 'claim']
+
+    # (create, upsert, insert, low_value, max_age, coalesce)
+    default = (True, None, None, False, None, False)
+
+    def __init__(self, routes):
+        self.routes = {
+            name: (route.get('create', True), route.get('upsert'), route.get('insert'), route.get('low_value', False), route.get('max_age'), route.get('coalesce', False))
+            for name, route in routes.items()
+        }
+
+        # Events that only update an entity's current state, so a newer
+        # one makes them obsolete
+        self.state_events = [name for name, route in self.routes.items() if not route[0] and not route[2]]
+
+        # Events that write nothing at all
+        self.discarded_events = [name for name, route in self.routes.items() if not route[0] and not route[1] and not route[2]]
+
+        # Events whose upsert the Coalescer may hold back
+        self.coalesced_events = [name for name, route in self.routes.items() if route[5]]
+
+    def get(self, event_name):
+        return self.routes.get(event_name, EventRouter.default)
+
+    def validate(self, key_events, rules):
+        # Routes and rules are matched on exact names, one that differs in
+        # case or wording routes nothing and goes unnoticed, so refuse to start
+        rule_names = {rule['event_name'] for rule in rules}
+        key_names = {key_event['event_name'] for key_event in key_events}
+        errors = []
+
+        for name, (create, upsert, insert, low_value, max_age, coalesce) in self.routes.items():
+            if name not in rule_names:
+                errors.append(f"route '{name}' matches no rule")
+            if name not in key_names:
+                errors.append(f"route '{name}' is not in key_events")
+            if upsert is not None and upsert not in EventRouter.upserts:
+                errors.append(f"route '{name}' upserts unknown entity '{upsert}'")
+            if insert is not None and insert not in EventRouter.inserts:
+                errors.append(f"route '{name}' inserts into unknown table '{insert}'")
+            # A string like "yes" or "1" from a rules file would only fail
+            # in handle_event, for every matching event
+            for key, value in (('create', create), ('low_value', low_value), ('coalesce', coalesce)):
+                if not isinstance(value, bool):
+                    errors.append(f"route '{name}' has {key} {value!r}, not true or false")
+            if max_age is not None and (isinstance(max_age, bool) or not isinstance(max_age, (int, float))):
+                errors.append(f"route '{name}' has max_age {max_age!r}, not a number of hours or null")
+            if coalesce and not upsert:
+                errors.append(f"route '{name}' coalesces without an upsert")
+
+        for name in sorted(key_names - rule_names):
+            errors.append(f"key event '{name}' matches no rule")
+
+        if errors:
+            raise ValueError("Invalid event routes: " + '; '.join(errors))
@@ -1,4 +1,6 @@
 import docker
+import os
+import signal
 import threading
 import sys
 
@@ -6,87 +8,337 @@ from src.logger import logger
 import src.constants as constants
 from src.streamparser import StreamParser
 from src.resourcemonitor import ResourceMonitor
+from src.patterns import Patterns
+from src.nexus import Nexus
+from src.spool import Spool
+from src.cursorstore import CursorStore
+from src.parsepool import ParsePool
+from src.cgroupreader import CgroupReader
+from src.discovery import Discovery
+from src.coalescer import Coalescer
+from src.backfill import Backfill
+from src.deadletter import DeadLetter
+from src.plotanalytics import PlotAnalytics
+from src.rulefile import RuleFile
+from src.rules import event_rules, event_routes
 
 class Hubble:
     def __init__(self, config) -> None:
 
         self.host_ip = config['host_ip']
         self.nexus_url = config['nexus_url']
-        self.docker_client = docker.from_env()
+        self.batch_size = config.get('batch_size', 0)
+        self.batch_delay = config.get('batch_delay', 1.0)
+        self.buffer_size = config.get('buffer_size', 10000)
+        self.overflow = config.get('overflow', 'drop_low_value')
+        self.spill_path = config.get('spill_path', './spool/overflow.jsonl')
+        self.spool_path = config.get('spool_path', '')
+        self.spool_max_mb = config.get('spool_max_mb', 1024)
+        self.cursor_path = config.get('cursor_path', './state/cursors.db')
+        self.parse_workers = config.get('parse_workers', 0)
+        self.monitor_interval = config.get('monitor_interval', 10)
+        self.monitor_workers = config.get('monitor_workers', 8)
+        self.monitor_stats = config.get('monitor_stats', 0)
+        self.stats_stream = config.get('stats_stream', 1)
+        ResourceMonitor.io_stats = bool(config.get('io_stats', 0))
+        self.cgroup_path = config.get('cgroup_path', '/sys/fs/cgroup')
+        if self.cgroup_path:
+            cgroup_reader = CgroupReader(self.cgroup_path)
+            if cgroup_reader.version:
+                ResourceMonitor.cgroup_reader = cgroup_reader
+            else:
+                logger.info(f"No cgroupfs at {self.cgroup_path}, using the Docker stats API")
+        self.http_pool_size = config.get('http_pool_size', 32)
+        self.http_timeout = config.get('http_timeout', 30)
+        self.connection_stats = config.get('connection_stats', 0)
+        self.delta_upserts = config.get('delta_upserts', 1)
+        self.upsert_heartbeat = config.get('upsert_heartbeat', 60)
+        self.coalesce_window = config.get('coalesce_window', 5)
+        self.backfill = config.get('backfill', 1)
+        self.backfill_hours = config.get('backfill_hours', 1)
+        self.backfill_batch = config.get('backfill_batch', 500)
+        self.dead_letter_path = config.get('dead_letter_path', './spool/deadletter.jsonl')
+        self.dead_letter_rate = config.get('dead_letter_rate', 60)
+        self.dead_letter_stats = config.get('dead_letter_stats', 300)
+        self.prefilter_stats = config.get('prefilter_stats', 0)
+        self.pattern_stats = config.get('pattern_stats', 0)
+        self.plot_stats = config.get('plot_stats', 0)
+        self.plot_stats_window = config.get('plot_stats_window', 1)
+        self.rules_path = config.get('rules_path', '')
+        # The rule tables in use and the signal to reload them
+        self.rules = None
+        self.reload_event = threading.Event()
+        try:
+            self.rules, (matcher, router) = self.load_rules()
+        except (OSError, ValueError) as e:
+            logger.error('Error loading the event rules:', exc_info=e)
+            sys.exit(1)
+        StreamParser.set_rules(matcher, router)
+        # Enough pooled connections for every parallel stats call
+        self.docker_client = docker.from_env(max_pool_size=max(10, self.monitor_workers))
         self.stop_event = threading.Event()
+        self.discovery = Discovery()
         self.containers = []
+        self.cursor_store = None
+        # container_id -> (parser thread, its stop event), while it runs
+        self.parsers = {}
+        # container_id -> container to parse once its stopped parser exits
+        self.restarts = {}
+        self.parsers_lock = threading.Lock()
 
-    def get_container_type(self, command):
-        if 'cache' in command and 'cluster' in command:
-            container_type = 'cluster_cache'
-        elif 'controller' in command and 'cluster' in command:
-            container_type = 'cluster_controller'
-        elif 'farmer' in command and 'cluster' in command:
-            container_type = 'cluster_farmer'
-        elif 'plotter' in command and 'cluster' in command:
-            container_type = 'cluster_plotter'
-        else:
-            container_type = 'farmer'
+    def load_rules(self):
+        # The built-in rule tables, or the ones in rules_path. A missing
+        # file is created from the built-in tables to start editing from.
+        tables = (event_rules, event_routes, constants.key_events)
+
+        if self.rules_path:
+            rule_file = RuleFile(self.rules_path)
+            if not os.path.exists(self.rules_path):
+                rule_file.save(*tables)
+                logger.info(f"Wrote the built-in event rules to {self.rules_path}")
+            tables = rule_file.load()
+
+        return tables, StreamParser.build_rules(*tables)
+
+    def watch_rules(self, stop_event):
+        # Reloads the rules on SIGHUP. Log streams keep running, lines read
+        # after the swap are parsed with the new rules and a file that does
+        # not load leaves the current rules in place.
+        while not stop_event.is_set():
+            if not self.reload_event.wait(1):
+                continue
+            self.reload_event.clear()
 
-        return container_type
+            try:
+                tables, (matcher, router) = self.load_rules()
+            except (OSError, ValueError) as e:
+                logger.error(f"Keeping the current event rules, {self.rules_path} did not load:", exc_info=e)
+                continue
+
+            StreamParser.set_rules(matcher, router)
+            if StreamParser.parse_pool:
+                StreamParser.parse_pool.set_rules(tables)
+            self.rules = tables
+            logger.info(f"Reloaded {len(matcher.rules)} event rules from {self.rules_path}")
 
     def get_containers(self):
         try:
-            containers = self.docker_client.containers.list(all=True)
-            for container in containers:
-                if 'subspace/node' in container.image.tags[0]:
-                    container_label = container.attrs['Config']['Labels'].get('com.subspace.name')
-                    self.containers.append({
-                        'container_type': 'node',
-                        'container_id': container.id,
-                        'container_name': container.name,
-                        'container_label': container_label,
-                        'container_alias': container_label if container_label else container.name
-                    })
-                    
-
-                elif 'subspace/farmer' in container.image.tags[0]:
-                    container_label = container.attrs['Config']['Labels'].get('com.subspace.name')
-                    self.containers.append({
-                        'container_type': self.get_container_type(container.attrs['Config']['Cmd']),
-                        'container_id': container.id,
-                        'container_name': container.name,
-                        'container_label': container_label,
-                        'container_alias': container_label if container_label else container.name
-                    })
+            self.discovery.load(self.docker_client)
+            self.containers = self.discovery.snapshot()
 
         except Exception as e:
             logger.error(f'Error getting container:', exc_info=e)
             sys.exit(1)
 
+    def start_parser(self, container):
+        # Called by discovery whenever a container starts running
+        if container['container_type'] not in Discovery.parse_types:
+            return
+
+        container_id = container['container_id']
+        with self.parsers_lock:
+            previous = self.parsers.get(container_id)
+            if previous:
+                if not previous[1].is_set():
+                    return
+                # Stopped for a rename but still finishing, e.g. a backfill
+                # read. It starts this parser when it exits, so two parsers
+                # never emit events or advance the cursor at once.
+                logger.info(f"Parser of {container['container_name']} is still stopping, restarting it once it exits")
+                self.restarts[container_id] = container
+                return
+
+            parser_stop = threading.Event()
+            thread = threading.Thread(target=self.run_parser, args=(container, parser_stop))
+            self.parsers[container_id] = (thread, parser_stop)
+            thread.start()
+
+    def run_parser(self, container, parser_stop):
+        container_id = container['container_id']
+        try:
+            StreamParser.start_parse(container, self.docker_client, parser_stop, self.nexus_url, self.cursor_store)
+        finally:
+            with self.parsers_lock:
+                del self.parsers[container_id]
+                restart = self.restarts.pop(container_id, None)
+
+            if restart:
+                self.start_parser(restart)
+
+    def stop_parser(self, container):
+        # Called by discovery when a container stops or is renamed
+        with self.parsers_lock:
+            self.restarts.pop(container['container_id'], None)
+            parser = self.parsers.get(container['container_id'])
+        if parser:
+            parser[1].set()
+            StreamParser.stop_stream(self.docker_client, container['container_id'])
+
+    def start_services(self, threads):
+        # Background services used by both runtimes, started as threads and
+        # appended to threads. Returns the log cursor store.
+
+        # All Nexus calls share one pooled keep-alive session
+        Nexus.configure_session(self.http_pool_size, self.http_timeout)
+
+        # Only send the fields of an entity that changed since the last write
+        if self.delta_upserts:
+            Nexus.enable_entity_cache(self.upsert_heartbeat)
+
+        if self.connection_stats:
+            connection_stats_thread = threading.Thread(
+                target=Nexus.report_connection_stats,
+                args=(self.stop_event, self.connection_stats)
+            )
+            threads.append(connection_stats_thread)
+            connection_stats_thread.start()
+
+        # Queue Nexus writes so parsing never waits on Nexus, optionally
+        # through a durable spool so nothing is lost if either side dies
+        if self.spool_path:
+            spool = Spool(self.spool_path, max_bytes=self.spool_max_mb * 1024 ** 2)
+            batcher = Nexus.enable_spooling(self.nexus_url, self.batch_size, self.batch_delay, spool)
+        else:
+            batcher = Nexus.enable_batching(self.nexus_url, self.batch_size, self.batch_delay, self.buffer_size, self.overflow, self.spill_path)
+        batcher_thread = threading.Thread(
+            target=batcher.start_flush,
+            args=(self.stop_event,)
+        )
+        threads.append(batcher_thread)
+        batcher_thread.start()
+
+        # Only the newest of each frequent status event reaches Nexus
+        if self.coalesce_window:
+            StreamParser.coalescer = Coalescer(self.nexus_url, self.coalesce_window)
+            coalescer_thread = threading.Thread(
+                target=StreamParser.coalescer.start_flush,
+                args=(self.stop_event,)
+            )
+            threads.append(coalescer_thread)
+            coalescer_thread.start()
+
+        # Lines that fail to parse are counted per rule and, up to a rate,
+        # written to a file instead of stalling their container
+        StreamParser.dead_letter = DeadLetter(self.dead_letter_path, self.dead_letter_rate)
+        dead_letter_thread = threading.Thread(
+            target=StreamParser.dead_letter.report_stats,
+            args=(self.stop_event, self.dead_letter_stats)
+        )
+        threads.append(dead_letter_thread)
+        dead_letter_thread.start()
+
+        # Periodically log how many lines the prefilter kept from the parser
+        if self.prefilter_stats:
+            prefilter_stats_thread = threading.Thread(
+                target=StreamParser.matcher.prefilter.report_stats,
+                args=(self.stop_event, self.prefilter_stats)
+            )
+            threads.append(prefilter_stats_thread)
+            prefilter_stats_thread.start()
+
+        # Sector timings summarized here instead of queried from the plot rows
+        if self.plot_stats:
+            StreamParser.plot_analytics = PlotAnalytics(self.nexus_url, self.plot_stats, self.plot_stats_window * 3600)
+            plot_analytics_thread = threading.Thread(
+                target=StreamParser.plot_analytics.start_push,
+                args=(self.stop_event,)
+            )
+            threads.append(plot_analytics_thread)
+            plot_analytics_thread.start()
+
+        # Periodically log which regex rules cost the most CPU
+        if self.pattern_stats:
+            Patterns.enable_stats()
+            pattern_stats_thread = threading.Thread(
+                target=Patterns.report_stats,
+                args=(self.stop_event, self.pattern_stats)
+            )
+            threads.append(pattern_stats_thread)
+            pattern_stats_thread.start()
+
+        # Periodically log how long resource monitor cycles take
+        if self.monitor_stats:
+            monitor_stats_thread = threading.Thread(
+                target=ResourceMonitor.report_cycle_stats,
+                args=(self.stop_event, self.monitor_stats)
+            )
+            threads.append(monitor_stats_thread)
+            monitor_stats_thread.start()
+
+        # Remember how far each container's logs were read so restarts
+        # and reconnects resume without asking Nexus
+        cursor_store = CursorStore(self.cursor_path)
+        cursor_store_thread = threading.Thread(
+            target=cursor_store.start_flush,
+            args=(self.stop_event,)
+        )
+        threads.append(cursor_store_thread)
+        cursor_store_thread.start()
+
+        # Containers far behind catch up in bulk before tailing live
+        if self.backfill:
+            StreamParser.backfill = Backfill(self.backfill_hours, self.backfill_batch, bool(self.batch_size))
+
+        # Optionally move regex parsing off this process's GIL
+        if self.parse_workers:
+            StreamParser.parse_pool = ParsePool(self.parse_workers, self.nexus_url, cursor_store)
+            parse_pool_thread = threading.Thread(
+                target=StreamParser.parse_pool.start,
+                args=(self.stop_event,)
+            )
+            threads.append(parse_pool_thread)
+            parse_pool_thread.start()
+
+            # Workers start with the built-in rules
+            if self.rules_path:
+                StreamParser.parse_pool.set_rules(self.rules)
+
+        # Edited rules take effect on SIGHUP, without restarting the streams
+        if self.rules_path and hasattr(signal, 'SIGHUP'):
+            signal.signal(signal.SIGHUP, lambda signum, frame: self.reload_event.set())
+            rules_thread = threading.Thread(
+                target=self.watch_rules,
+                args=(self.stop_event,)
+            )
+            threads.append(rules_thread)
+            rules_thread.start()
+
+        return cursor_store
+
     def run(self):
+        threads = []
+
         try:
-            self.get_containers()  # Assuming this method populates self.containers
+            self.get_containers()
 
             for container in self.containers:
                 logger.info(container)
 
-            
-
-            threads = []
+            self.cursor_store = self.start_services(threads)
 
             # Start the ResourceMonitor in a separate thread
             resource_monitor_thread = threading.Thread(
                 target=ResourceMonitor.start_monitor,
-                args=(self.containers, self.docker_client, self.stop_event, self.nexus_url, self.host_ip)
+                args=(self.discovery, self.docker_client, self.stop_event, self.nexus_url, self.host_ip, self.monitor_interval, self.monitor_workers, self.stats_stream)
             )
             threads.append(resource_monitor_thread)
             resource_monitor_thread.start()
 
-            # Start a thread for each container
+            # A parser thread per running container, then follow Docker
+            # events to start and stop them as containers come and go
             for container in self.containers:
-                if container['container_type'] in ['node', 'farmer', 'cluster_farmer', 'cluster_cache', 'cluster_plotter', 'cluster_controller']:
-                    thread = threading.Thread(
-                        target=StreamParser.start_parse,
-                        args=(container, self.docker_client, self.stop_event, self.nexus_url)
-                    )
-                    threads.append(thread)
-                    thread.start()
+                if self.discovery.is_running(container['container_id']):
+                    self.start_parser(container)
+
+            self.discovery.on_start = self.start_parser
+            self.discovery.on_stop = self.stop_parser
+
+            discovery_thread = threading.Thread(
+                target=self.discovery.watch,
+                args=(self.docker_client, self.stop_event)
+            )
+            threads.append(discovery_thread)
+            discovery_thread.start()
 
             # Join all threads to wait for their completion
             for thread in threads:
@@ -95,3 +347,6 @@ class Hubble:
         except KeyboardInterrupt:
             print("Stop signal received. Gracefully shutting down monitors.")
             self.stop_event.set()  # Ensure the stop event is set
+            self.discovery.close()
+            for container in self.discovery.snapshot():
+                self.stop_parser(container)
@@ -0,0 +1,129 @@
+import struct
+
+from docker.utils import datetime_to_timestamp
+
+
+class LogReader:
+    # Splits a raw Docker log stream into lines. Without a TTY the daemon
+    # multiplexes stdout and stderr into frames of an 8 byte header
+    # (stream type, three zero bytes, big-endian payload length) followed
+    # by the payload, and neither frames nor reads line up with lines.
+    #
+    # Incoming data is appended to one reusable bytearray and walked with a
+    # memoryview, so a line is only copied out once it is complete and has
+    # passed the prefilter. Only lines that span frames are assembled in a
+    # separate buffer.
+    header = struct.Struct('>BxxxL')
+
+    def __init__(self, multiplexed=True, prefilter=None):
+        self.multiplexed = multiplexed
+        self.prefilter = prefilter
+        self.buffer = bytearray()
+        self.partial = bytearray()
+        # Complete lines seen, including the ones the prefilter dropped
+        self.lines = 0
+
+    @staticmethod
+    def open_stream(docker_client, container, since, follow=True, until=None):
+        # docker-py only exposes the stream already cut into frames, so ask
+        # for the response itself the same way ContainerApiMixin.logs does.
+        # Without follow the stream ends at until, or at the current end.
+        api = docker_client.api
+        params = {'stdout': 1, 'stderr': 1, 'follow': 1 if follow else 0, 'timestamps': 0, 'since': max(0, datetime_to_timestamp(since))}
+        if until is not None:
+            params['until'] = datetime_to_timestamp(until)
+        response = api._get(api._url('/containers/{0}/logs', container.id), params=params, stream=True)
+        api._raise_for_status(response)
+
+        # Disable the read timeout, a quiet container is not an error
+        api._disable_socket_timeout(api._get_raw_response_socket(response))
+        return response
+
+    def read(self, raw, read_size=65536):
+        # Blocking generator over a file-like response body. read1 returns
+        # whatever has arrived instead of waiting for read_size bytes.
+        while True:
+            data = raw.read1(read_size)
+            if not data:
+                break
+
+            yield from self.feed(data)
+
+        line = self.flush()
+        if line:
+            yield line
+
+    def feed(self, data):
+        # Returns the complete lines that data finishes
+        buffer = self.buffer
+        buffer += data
+        view = memoryview(buffer)
+        lines = []
+        seen = self.lines
+
+        try:
+            if not self.multiplexed:
+                consumed = self.split(view, 0, len(buffer), lines)
+            else:
+                consumed = 0
+                end = len(buffer)
+                header_size = LogReader.header.size
+
+                # Only whole frames are split, a partial one waits for more data
+                while end - consumed >= header_size:
+                    _, size = LogReader.header.unpack_from(buffer, consumed)
+                    start = consumed + header_size
+                    if end - start < size:
+                        break
+
+                    self.split(view, start, start + size, lines)
+                    consumed = start + size
+        finally:
+            view.release()
+
+        del buffer[:consumed]
+
+        if self.prefilter:
+            self.prefilter.record(self.lines - seen, len(lines))
+        return lines
+
+    def split(self, view, start, stop, lines):
+        # Cuts view[start:stop] at newlines. Returns how far it consumed,
+        # which is always stop: a trailing partial line moves to self.partial.
+        buffer = view.obj
+        prefilter = self.prefilter.test if self.prefilter else None
+
+        while start < stop:
+            newline = buffer.find(b'\n', start, stop)
+
+            if newline < 0:
+                self.partial += view[start:stop]
+                return stop
+
+            end = newline + 1
+            self.lines += 1
+
+            if self.partial:
+                self.partial += view[start:end]
+                line = bytes(self.partial)
+                self.partial.clear()
+                if not prefilter or prefilter(line):
+                    lines.append(line)
+            elif not prefilter or prefilter(view[start:end]):
+                lines.append(bytes(view[start:end]))
+
+            start = end
+
+        return stop
+
+    def flush(self):
+        # Whatever is left once the stream ends, a last line without newline
+        line = bytes(self.partial)
+        self.partial.clear()
+
+        if line and self.prefilter:
+            passed = self.prefilter.test(line)
+            self.prefilter.record(1, int(passed))
+            return line if passed else None
+
+        return line or None
@@ -1,27 +1,519 @@
 from src.logger import logger
+from src.event import Event
+from requests.adapters import HTTPAdapter
 import requests
-import sys
+import collections
+import json
+import os
+import random
+import threading
 import time
 
+class NexusBatcher:
+    # Delivery queue between the log parsers and Nexus. Writes are
+    # serialized when they are added, so callers may keep mutating the
+    # dicts they passed in, and are sent from a background thread either
+    # one by one or, when max_batch is set, as a bulk request to
+    # /bulk/{action}/{entity} with a body of {"items": [...]}.
+    #
+    # Failed sends are retried with exponential backoff and full jitter
+    # without ever blocking the parsers. The queue holds at most max_buffer
+    # items; past that the overflow policy either drops the oldest
+    # low-value write (periodic status updates that the next one
+    # supersedes) or spills new writes to disk until there is room again.
+    # drop_low_value never drops anything else: with no low-value write
+    # queued, a low-value newcomer is dropped and an important one is
+    # spilled to disk like under the spill policy.
+    def __init__(self, base_url, max_batch, max_delay, max_buffer=10000, overflow='drop_low_value', spill_path='./spool/overflow.jsonl', base_backoff=1.0, max_backoff=60.0):
+        self.base_url = base_url
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_buffer = max_buffer
+        self.overflow = overflow
+        self.spill_path = spill_path
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+
+        # (action, entity, low_value) -> deque of (sequence, serialized).
+        # buffered counts queued writes plus the ones currently in flight.
+        self.buffers = {}
+        self.buffered = 0
+        self.sequence = 0
+        self.spilled = 0
+        self.spill_offset = 0
+        self.condition = threading.Condition()
+
+        self.failures = 0
+        self.retry_at = 0
+
+        # Writes left on disk by a previous run are delivered first
+        if self.spill_path and os.path.exists(self.spill_path):
+            with open(self.spill_path, 'r', encoding='utf-8') as f:
+                self.spilled = sum(1 for _ in f)
+            logger.info(f"Found {self.spilled} undelivered Nexus writes in {self.spill_path}")
+
+        self.flushed_items = 0
+        self.flushed_batches = 0
+        self.dropped_items = 0
+        self.rejected_items = 0
+
+    def add(self, action, entity, item, low_value=False):
+        serialized = json.dumps(item, default=str)
+
+        with self.condition:
+            # Keep FIFO order: once writes are spilling, new ones follow them
+            if self.spilled:
+                self.spill(action, entity, low_value, serialized)
+                return
+
+            if self.buffered >= self.max_buffer:
+                if self.overflow == 'drop_low_value' and not self.drop_oldest():
+                    if low_value:
+                        self.count_dropped()
+                        Nexus.forget_entities(entity)
+                        return
+                    self.spill(action, entity, low_value, serialized)
+                    return
+
+                if self.overflow == 'spill':
+                    self.spill(action, entity, low_value, serialized)
+                    return
+
+            self.append(action, entity, low_value, serialized)
+
+            if self.max_batch and len(self.buffers[(action, entity, low_value)]) >= self.max_batch:
+                self.condition.notify()
+
+    def append(self, action, entity, low_value, serialized):
+        self.sequence += 1
+        self.buffers.setdefault((action, entity, low_value), collections.deque()).append((self.sequence, serialized))
+        self.buffered += 1
+
+    def drop_oldest(self):
+        # Makes room by dropping the oldest queued low-value write. Returns
+        # False when there is none, important writes are never dropped.
+        candidates = [(key, buffer) for key, buffer in self.buffers.items() if key[2] and buffer]
+        if not candidates:
+            return False
+
+        oldest_key, oldest = min(candidates, key=lambda candidate: candidate[1][0][0])
+        oldest.popleft()
+        self.buffered -= 1
+        self.count_dropped()
+        Nexus.forget_entities(oldest_key[1])
+        return True
+
+    def count_dropped(self):
+        self.dropped_items += 1
+        if self.dropped_items % 1000 == 1:
+            logger.warning(f"Nexus delivery buffer full, dropped {self.dropped_items} low-value writes so far")
+
+    def spill(self, action, entity, low_value, serialized):
+        os.makedirs(os.path.dirname(self.spill_path) or '.', exist_ok=True)
+        with open(self.spill_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps([action, entity, low_value]) + '\t' + serialized + '\n')
+        self.spilled += 1
+
+    def unspill(self):
+        # Move spilled writes back into memory once there is room
+        with self.condition:
+            room = self.max_buffer // 2 - self.buffered
+            if not self.spilled or room <= 0:
+                return
+
+            with open(self.spill_path, 'r', encoding='utf-8') as f:
+                f.seek(self.spill_offset)
+                while room > 0:
+                    line = f.readline()
+                    if not line:
+                        break
+                    header, serialized = line.rstrip('\n').split('\t', 1)
+                    action, entity, low_value = json.loads(header)
+                    self.append(action, entity, low_value, serialized)
+                    self.spilled -= 1
+                    room -= 1
+                self.spill_offset = f.tell()
+
+            if not self.spilled:
+                os.remove(self.spill_path)
+                self.spill_offset = 0
+
+    def take_ready(self, force):
+        # Swap out every buffer that is due so the lock is not held while
+        # the HTTP requests are in flight
+        with self.condition:
+            ready = {}
+            for key, buffer in self.buffers.items():
+                if buffer and (force or (self.max_batch and len(buffer) >= self.max_batch)):
+                    ready[key] = buffer
+            for key in ready:
+                self.buffers[key] = collections.deque()
+            return ready
+
+    def put_back(self, key, items):
+        with self.condition:
+            buffer = self.buffers.setdefault(key, collections.deque())
+            buffer.extendleft(reversed(items))
+
+    def send(self, action, entity, chunk):
+        # Returns True when the chunk is done with (delivered or rejected),
+        # False when it should be retried later
+        if self.max_batch:
+            url = f"{self.base_url}/bulk/{action}/{entity}"
+            body = '{"items": [' + ', '.join(serialized for _, serialized in chunk) + ']}'
+        else:
+            url = f"{self.base_url}/{action}/{entity}"
+            body = chunk[0][1]
+
+        response = Nexus.push(url, body, serialized=True)
+
+        if response is None or response.status_code >= 500 or response.status_code == 429:
+            return False
+
+        if response.status_code >= 300:
+            # Nexus refused the payload itself, retrying will not help
+            self.rejected_items += len(chunk)
+            Nexus.forget_entities(entity)
+        else:
+            self.flushed_items += len(chunk)
+            self.flushed_batches += 1
+
+        return True
+
+    def flush(self, force=True):
+        ready = list(self.take_ready(force).items())
+        size = self.max_batch or 1
+
+        for index, (key, buffer) in enumerate(ready):
+            items = list(buffer)
+            action, entity, _ = key
+
+            for start in range(0, len(items), size):
+                chunk = items[start:start + size]
+                if not self.send(action, entity, chunk):
+                    # Keep everything that has not been delivered yet
+                    self.put_back(key, items[start:])
+                    for other_key, other_buffer in ready[index + 1:]:
+                        self.put_back(other_key, list(other_buffer))
+                    return False
+
+                with self.condition:
+                    self.buffered -= len(chunk)
+
+        return True
+
+    def backoff(self):
+        # Exponential backoff with full jitter
+        delay = min(self.max_backoff, self.base_backoff * (2 ** min(self.failures, 16)))
+        return random.uniform(0, delay)
+
+    def start_flush(self, stop_event):
+        logger.info(f"Delivering Nexus writes: batches of {self.max_batch or 1}, every {self.max_delay}s, {self.describe_buffer()}")
+        deadline = time.monotonic() + self.max_delay
+
+        while not stop_event.is_set():
+            with self.condition:
+                self.condition.wait(max(0, max(deadline, self.retry_at) - time.monotonic()))
+
+            now = time.monotonic()
+            if now < self.retry_at:
+                continue
+
+            # Full buffers go out immediately, everything else on the timer
+            force = now >= deadline
+            if force:
+                deadline = now + self.max_delay
+
+            if self.flush(force=force):
+                if self.failures:
+                    logger.info(f"Nexus delivery recovered after {self.failures} failed attempts")
+                self.failures = 0
+                self.retry_at = 0
+                self.unspill()
+            else:
+                self.failures += 1
+                delay = self.backoff()
+                self.retry_at = time.monotonic() + delay
+                logger.warning(f"Nexus delivery failed {self.failures} times, {self.buffered} writes buffered, retrying in {delay:.1f}s")
+
+        # One last attempt, then keep whatever is left on disk if we can
+        if not self.flush(force=True) and self.overflow == 'spill':
+            with self.condition:
+                for (action, entity, low_value), buffer in self.buffers.items():
+                    for _, serialized in buffer:
+                        self.spill(action, entity, low_value, serialized)
+                self.buffers = {}
+                self.buffered = 0
+
+        logger.info(f"Nexus delivery stopped: {self.flushed_items} items in {self.flushed_batches} requests, {self.dropped_items} dropped, {self.rejected_items} rejected, {self.buffered + self.spilled} undelivered")
+
+    def describe_buffer(self):
+        return f"buffer {self.max_buffer}, overflow {self.overflow}"
+
+
+class NexusSpooler(NexusBatcher):
+    # Same delivery loop as NexusBatcher, but every write is appended to a
+    # durable Spool first and the flush thread drains the spool in order,
+    # acknowledging each batch once Nexus has taken it. A batch that fails
+    # part-way is sent again in full, so delivery is at-least-once.
+    def __init__(self, base_url, max_batch, max_delay, spool):
+        super().__init__(base_url, max_batch, max_delay, spill_path=None)
+        self.spool = spool
+        self.buffered = spool.pending
+
+    def add(self, action, entity, item, low_value=False):
+        # The discarded records can be of any entity, so every entity's
+        # next upsert is sent in full
+        if self.spool.append(json.dumps([action, entity, low_value]) + '\t' + json.dumps(item, default=str)):
+            Nexus.forget_entities()
+
+        with self.condition:
+            self.buffered = self.spool.pending
+            if self.max_batch and self.buffered >= self.max_batch:
+                self.condition.notify()
+
+    def flush(self, force=True):
+        read_size = max(self.max_batch, 500)
+
+        while True:
+            records, position, counts = self.spool.read(read_size)
+            if not records or (not force and len(records) < self.max_batch):
+                return True
+
+            # Group by endpoint, keeping the spool order within each group
+            groups = {}
+            for sequence, record in enumerate(records):
+                header, serialized = record.split('\t', 1)
+                action, entity, _ = json.loads(header)
+                groups.setdefault((action, entity), []).append((sequence, serialized))
+
+            size = self.max_batch or 1
+            for (action, entity), items in groups.items():
+                for start in range(0, len(items), size):
+                    if not self.send(action, entity, items[start:start + size]):
+                        return False
+
+            self.spool.ack(position, counts)
+            with self.condition:
+                self.buffered = self.spool.pending
+
+    def unspill(self):
+        pass
+
+    def describe_buffer(self):
+        return f"spool {self.spool.path}, {self.spool.pending} pending"
+
+    def start_flush(self, stop_event):
+        super().start_flush(stop_event)
+        self.spool.close()
+
+
+class NexusEntityCache:
+    # Last values written for each entity, so an upsert only carries the
+    # fields that changed since, plus the entity's key. Unchanged upserts
+    # are not sent at all. Every heartbeat seconds an entity is sent in
+    # full again, which reports it as alive and repairs a Nexus that lost
+    # its state. Writes that were dropped or rejected forget their entity
+    # type, so the next upsert of each is sent in full. Records the spool
+    # discards forget every entity type.
+
+    # Entity -> field that identifies it. Other entities are not cached.
+    keys = {
+        'host': 'host_name',
+        'container': 'container_id',
+        'node': 'container_id',
+        'farmer': 'container_id',
+        'cluster_farmer': 'container_id',
+        'cluster_cache': 'container_id',
+        'cluster_plotter': 'container_id',
+        'cluster_controller': 'container_id',
+    }
+
+    def __init__(self, heartbeat=60):
+        self.heartbeat = heartbeat
+        self.lock = threading.Lock()
+        # (entity, key value) -> [field values, time of the last full write]
+        self.entries = {}
+        self.full = 0
+        self.partial = 0
+        self.skipped = 0
+
+    def diff(self, entity, item):
+        # What to send for this upsert, None if nothing changed
+        key_field = NexusEntityCache.keys.get(entity)
+        if not key_field or key_field not in item:
+            return item
+
+        key = (entity, item[key_field])
+        now = time.monotonic()
+
+        with self.lock:
+            entry = self.entries.get(key)
+
+            if entry is None or (self.heartbeat and now - entry[1] >= self.heartbeat):
+                values = entry[0] if entry else {}
+                values.update(item)
+                self.entries[key] = [values, now]
+                self.full += 1
+                return item
+
+            values = entry[0]
+            changed = {field: value for field, value in item.items() if field not in values or values[field] != value}
+            if not changed:
+                self.skipped += 1
+                return None
+
+            values.update(changed)
+            self.partial += 1
+            changed[key_field] = item[key_field]
+            return changed
+
+    def forget(self, entity, key_value=None):
+        with self.lock:
+            for key in [key for key in self.entries if entity is None or (key[0] == entity and (key_value is None or key[1] == key_value))]:
+                del self.entries[key]
+
+    def get_stats(self):
+        with self.lock:
+            total = self.full + self.partial + self.skipped
+            return {
+                'full': self.full,
+                'partial': self.partial,
+                'skipped': self.skipped,
+                'skipped_pct': round(self.skipped / total * 100, 2) if total else 0.0
+            }
+
+
 class Nexus:
+    batcher = None
+    entity_cache = None
+    # Lets one thread deliver through its own batcher, see Backfill
+    local = threading.local()
+    session = None
+    session_lock = threading.Lock()
+    timeout = (5, 30)
+
+    @staticmethod
+    def configure_session(pool_size=32, timeout=30):
+        # One keep-alive session shared by every thread. pool_block bounds
+        # the number of open connections to Nexus to pool_size; callers
+        # wait for a free connection instead of opening another one.
+        session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, pool_block=True, max_retries=0)
+        session.mount('http://', adapter)
+        session.mount('https://', adapter)
+
+        with Nexus.session_lock:
+            Nexus.session = session
+            Nexus.timeout = (min(5, timeout), timeout)
+
+        return session
+
+    @staticmethod
+    def get_session():
+        if Nexus.session is None:
+            Nexus.configure_session()
+        return Nexus.session
+
+    @staticmethod
+    def get_connection_stats():
+        # urllib3 counts the connections each pool had to open and the
+        # requests it served, everything above one request per connection
+        # was a reuse of a kept-alive connection
+        connections = 0
+        requests_made = 0
+
+        if Nexus.session:
+            for adapter in set(Nexus.session.adapters.values()):
+                for key in list(adapter.poolmanager.pools.keys()):
+                    pool = adapter.poolmanager.pools.get(key)
+                    if pool:
+                        connections += pool.num_connections
+                        requests_made += pool.num_requests
+
+        return {
+            'connections_opened': connections,
+            'requests': requests_made,
+            'reuse_pct': round((1 - connections / requests_made) * 100, 2) if requests_made else 0.0
+        }
+
+    @staticmethod
+    def report_connection_stats(stop_event, interval):
+        while not stop_event.wait(interval):
+            logger.info(f"Nexus connection stats: {Nexus.get_connection_stats()}")
+            if Nexus.entity_cache:
+                logger.info(f"Nexus upsert stats: {Nexus.entity_cache.get_stats()}")
+
+    @staticmethod
+    def enable_entity_cache(heartbeat=60):
+        Nexus.entity_cache = NexusEntityCache(heartbeat)
+        return Nexus.entity_cache
+
+    @staticmethod
+    def forget_entities(entity=None):
+        # A write of this entity, or of any entity when None, was lost, send
+        # the next ones in full
+        if Nexus.entity_cache:
+            Nexus.entity_cache.forget(entity)
+
+    @staticmethod
+    def get_batcher():
+        return getattr(Nexus.local, 'batcher', None) or Nexus.batcher
+
+    @staticmethod
+    def enable_batching(base_url, max_batch, max_delay, max_buffer=10000, overflow='drop_low_value', spill_path='./spool/overflow.jsonl'):
+        Nexus.batcher = NexusBatcher(base_url, max_batch, max_delay, max_buffer, overflow, spill_path)
+        return Nexus.batcher
+
+    @staticmethod
+    def enable_spooling(base_url, max_batch, max_delay, spool):
+        Nexus.batcher = NexusSpooler(base_url, max_batch, max_delay, spool)
+        return Nexus.batcher
+
     @staticmethod
-    def upsert_entity(base_url, entity, event):
+    def payload(item):
+        # Parsed events only take the dict shape Nexus expects here
+        return item.to_dict() if isinstance(item, Event) else item
+
+    @staticmethod
+    def upsert_entity(base_url, entity, event, low_value=False):
+        event = Nexus.payload(event)
+
+        # Only the fields that changed, nothing if none did
+        if Nexus.entity_cache:
+            event = Nexus.entity_cache.diff(entity, event)
+            if event is None:
+                return True
+
+        batcher = Nexus.get_batcher()
+        if batcher:
+            batcher.add('upsert', entity, event, low_value)
+            return True
+
         local_url = f"{base_url}/upsert/{entity}"
         response = Nexus.push(local_url, event)
-        if response.status_code < 300: return response.json()
-        else: return False
+        if response is not None and response.status_code < 300: return response.json()
+        else:
+            Nexus.forget_entities(entity)
+            return False
 
     @staticmethod
     def create_event(base_url, event):
+        event = Nexus.payload(event)
+        batcher = Nexus.get_batcher()
+        if batcher:
+            batcher.add('insert', 'event', event)
+            return True
+
         local_url = f"{base_url}/insert/event"
         response = Nexus.push(local_url, event)
-        if response.status_code == 201: return response.json()
+        if response is not None and response.status_code == 201: return response.json()
         else: return False
 
     @staticmethod
     def get_latest_events(base_url, name):
         local_url = f"{base_url}/get/events?event_source={name}"
-        response = requests.get(local_url)
+        response = Nexus.get_session().get(local_url, timeout=Nexus.timeout)
         json_data = response.json()
 
         if response.status_code < 300:
@@ -32,30 +524,33 @@ class Nexus:
 
     @staticmethod
     def insert_entity(base_url, entity, event):
+        event = Nexus.payload(event)
+        batcher = Nexus.get_batcher()
+        if batcher:
+            batcher.add('insert', entity, event)
+            return True
+
         local_url = f"{base_url}/insert/{entity}"
         response = Nexus.push(local_url, event)
-        if response.status_code < 300: return response.json()
+        if response is not None and response.status_code < 300: return response.json()
         else: return False
 
     @staticmethod
-    def push(local_url, event):
-        max_retries = 10
-        retries = 0
+    def push(local_url, event, serialized=False):
+        # Single attempt. Retrying is up to the caller, the delivery queue
+        # backs off without blocking the threads that parse logs.
+        try:
+            session = Nexus.get_session()
+            if serialized:
+                response = session.post(local_url, data=event, headers={'Content-Type': 'application/json'}, timeout=Nexus.timeout)
+            else:
+                response = session.post(local_url, json=event, timeout=Nexus.timeout)
 
-        while True:
-            try:
-                response = requests.post(local_url, json=event)
-                if response.status_code >= 300:
-                    logger.info(event)
-                    logger.error(response.json())
-                    time.sleep(10)
-                    
-                return response
-
-            except Exception as e:
-                if retries == max_retries:
-                    logger.error('Max retries reached. Exiting...')
-                    sys.exit(1)
-                retries+=1
-                logger.error(f"Retries: {retries}, Max allowed: {max_retries}")
-                time.sleep(1)
\ No newline at end of file
+            if response.status_code >= 300:
+                logger.error(f"Nexus returned {response.status_code} for {local_url}: {response.text[:200]}")
+
+            return response
+
+        except Exception as e:
+            logger.error(f"Error pushing to {local_url}: {e}")
+            return None
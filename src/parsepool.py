@@ -0,0 +1,226 @@
+import collections
+import multiprocessing
+import queue
+import threading
+import time
+
+from src.logger import logger
+from src.streamparser import StreamParser
+from src.deadletter import DeadLetter
+from src.event import Event
+
+
+class ParsePool:
+    # Runs parse_log/parse_event in worker processes so parsing is not
+    # bound to one core. Reader threads hand raw lines to submit(); lines
+    # are grouped per container into chunks and every container is pinned
+    # to one worker, whose task queue is FIFO, so events come back in log
+    # order. A single consumer thread turns the returned event tuples back
+    # into events and runs handle_event and the cursor update.
+    #
+    # submit() never blocks, it may run on the asyncio loop. Chunks a full
+    # worker queue cannot take wait in a per-worker backlog, and readers
+    # pause through backlogged() or wait() while it is full.
+    def __init__(self, workers, nexus_url, cursor_store=None, chunk_lines=256, max_delay=0.2, queue_size=64):
+        self.workers = workers
+        self.nexus_url = nexus_url
+        self.cursor_store = cursor_store
+        self.chunk_lines = chunk_lines
+        self.max_delay = max_delay
+
+        context = multiprocessing.get_context('spawn')
+        self.tasks = [context.Queue(queue_size) for _ in range(workers)]
+        self.results = context.Queue()
+        self.processes = [
+            context.Process(target=ParsePool.work, args=(tasks, self.results), daemon=True)
+            for tasks in self.tasks
+        ]
+
+        self.lock = threading.Lock()
+        self.send_locks = [threading.Lock() for _ in range(workers)]
+        self.shards = {}
+        # container_id -> [container_alias, container_type, first line time, lines]
+        self.pending = {}
+        # Per worker, chunks its queue had no room for yet, oldest first
+        self.backlogs = [collections.deque() for _ in range(workers)]
+        self.max_backlog = queue_size
+        # How often a paused reader checks its backlog again
+        self.pause = 0.01
+
+        for process in self.processes:
+            process.start()
+
+    @staticmethod
+    def work(tasks, results):
+        # Worker process: parse chunks until the None sentinel arrives.
+        # Lines that fail to parse go back with the chunk's events, the
+        # dead-letter file is written by the main process.
+        StreamParser.dead_letter = DeadLetter(collect=True)
+
+        while True:
+            task = tasks.get()
+            if task is None:
+                results.put(None)
+                return
+
+            # Rule tables from set_rules, already checked by the main process
+            if task[0] is None:
+                try:
+                    StreamParser.set_rules(*StreamParser.build_rules(*task[1]))
+                except ValueError as e:
+                    logger.error("Parse worker keeps its current event rules:", exc_info=e)
+                continue
+
+            container_id, container_alias, container_type, lines = task
+            events = []
+            last = None
+
+            for line in lines:
+                try:
+                    parsed_log = StreamParser.parse_log(line.decode('utf-8').strip(), container_alias)
+                    if not parsed_log:
+                        continue
+
+                    last = (parsed_log[0], line)
+
+                    event = StreamParser.parse_event(parsed_log, container_id, container_alias, container_type)
+                    if event:
+                        events.append((event.name, event.type, event.level, event.datetime, event.data))
+
+                except Exception as e:
+                    logger.error(f"Error in parse worker for container {container_alias}:", exc_info=e)
+
+            results.put((container_id, container_alias, container_type, last, events, StreamParser.dead_letter.take()))
+
+    def set_rules(self, tables):
+        # Queued behind the chunks already sent, so those are still parsed
+        # with the rules they were read under
+        for shard in range(self.workers):
+            with self.send_locks[shard]:
+                self.enqueue(shard, (None, tables))
+
+    def backlogged(self, container_id):
+        # True while the container's worker is too far behind, its reader
+        # should pause instead of reading on
+        shard = self.shards.get(container_id)
+        if shard is None or len(self.backlogs[shard]) < self.max_backlog:
+            return False
+
+        # Hand the worker what it has room for by now before deciding
+        with self.send_locks[shard]:
+            self.drain(shard)
+        return len(self.backlogs[shard]) >= self.max_backlog
+
+    def wait(self, container_id, stop_event):
+        # For reader threads, the asyncio runtime sleeps on the loop instead
+        while self.backlogged(container_id) and not stop_event.wait(self.pause):
+            pass
+
+    def submit(self, log, container_id, container_alias, container_type, skipper):
+        # Lines replayed from before the cursor are dropped here, which
+        # needs the timestamp, so only those are parsed on the reader side
+        if skipper.active:
+            parsed_log = StreamParser.parse_log(log.decode('utf-8').strip(), container_alias)
+            if not parsed_log or skipper.skip(parsed_log[0], log):
+                return
+
+        with self.lock:
+            shard = self.shards.setdefault(container_id, len(self.shards) % self.workers)
+
+        # Taking a chunk out of pending and queueing it happen under the
+        # shard's lock, so the flush thread cannot reorder a container's chunks
+        with self.send_locks[shard]:
+            with self.lock:
+                entry = self.pending.get(container_id)
+                if entry is None:
+                    entry = self.pending[container_id] = [container_alias, container_type, time.monotonic(), []]
+                entry[3].append(log)
+
+                if len(entry[3]) < self.chunk_lines:
+                    return
+
+                del self.pending[container_id]
+
+            self.send(shard, container_id, entry)
+
+    def send(self, shard, container_id, entry):
+        container_alias, container_type, _, lines = entry
+        self.enqueue(shard, (container_id, container_alias, container_type, lines))
+
+    def enqueue(self, shard, task):
+        # Called with the shard's send lock held. The backlog goes first,
+        # so a task never overtakes an older one of the same worker.
+        self.backlogs[shard].append(task)
+        self.drain(shard)
+
+    def drain(self, shard):
+        backlog = self.backlogs[shard]
+        while backlog:
+            try:
+                self.tasks[shard].put_nowait(backlog[0])
+            except queue.Full:
+                return
+            backlog.popleft()
+
+    def flush(self, force=False):
+        # Send chunks that waited max_delay so quiet containers do not hold
+        # their last lines back
+        for shard in range(self.workers):
+            with self.send_locks[shard]:
+                now = time.monotonic()
+                with self.lock:
+                    ready = [
+                        (container_id, entry) for container_id, entry in self.pending.items()
+                        if self.shards[container_id] == shard and (force or now - entry[2] >= self.max_delay)
+                    ]
+                    for container_id, _ in ready:
+                        del self.pending[container_id]
+
+                for container_id, entry in ready:
+                    self.send(shard, container_id, entry)
+
+                self.drain(shard)
+
+    def consume(self):
+        finished = 0
+
+        while finished < self.workers:
+            result = self.results.get()
+            if result is None:
+                finished += 1
+                continue
+
+            container_id, container_alias, container_type, last, events, rejects = result
+
+            if StreamParser.dead_letter:
+                for reject in rejects:
+                    StreamParser.dead_letter.add(*reject)
+
+            for event_name, event_type, event_level, event_datetime, event_data in events:
+                event = Event(event_name, event_type, container_type, container_alias, event_level, container_id, event_datetime, event_data)
+                StreamParser.handle_event(event, self.nexus_url, container_id, container_alias, container_type)
+
+            # Only move the cursor once the chunk's events were handled
+            if last and self.cursor_store:
+                self.cursor_store.update(container_id, last[0], last[1])
+
+    def start(self, stop_event):
+        logger.info(f"Parsing logs in {self.workers} worker processes")
+
+        consumer = threading.Thread(target=self.consume)
+        consumer.start()
+
+        while not stop_event.wait(self.max_delay):
+            self.flush()
+
+        # Drain what is left, then let each worker finish its queue
+        self.flush(force=True)
+        for shard, tasks in enumerate(self.tasks):
+            with self.send_locks[shard]:
+                while self.backlogs[shard]:
+                    tasks.put(self.backlogs[shard].popleft())
+            tasks.put(None)
+
+        consumer.join()
+        for process in self.processes:
+            process.join()
@@ -0,0 +1,84 @@
+import re
+import threading
+import time
+
+from src.logger import logger
+
+
+class Patterns:
+    # Every regex used on the parsing hot path, compiled once at import.
+    # Rule patterns are added by EventMatcher when the rule table is loaded.
+    compiled = {
+        'log_line': re.compile(r'(?P<datetime>\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}\.\d+Z)\s+(?P<level>\w+)\s+(?P<data>.+)'),
+        'cpu_set': re.compile(r'CpuSet\((.*?)\)'),
+        'cache_path': re.compile(r"path=(.*?)(?=,)"),
+        'cache_size': re.compile(r"size=(.*)"),
+    }
+
+    # Per-pattern [hits, misses, seconds], only collected when enabled
+    stats_enabled = False
+    stats = {}
+    stats_lock = threading.Lock()
+
+    @staticmethod
+    def register(name, pattern):
+        compiled = Patterns.compiled.get(name)
+        if compiled is None or compiled.pattern != pattern:
+            compiled = re.compile(pattern)
+            Patterns.compiled[name] = compiled
+        return compiled
+
+    @staticmethod
+    def enable_stats():
+        Patterns.stats_enabled = True
+
+    @staticmethod
+    def record(name, hit, elapsed):
+        with Patterns.stats_lock:
+            entry = Patterns.stats.setdefault(name, [0, 0, 0.0])
+            entry[0 if hit else 1] += 1
+            entry[2] += elapsed
+
+    @staticmethod
+    def run(name, method, text):
+        return Patterns.call(name, getattr(Patterns.compiled[name], method), text)
+
+    @staticmethod
+    def call(name, function, text):
+        # For callers that hold their own compiled pattern, e.g. an
+        # EventMatcher whose rules were replaced in the registry by a reload
+        if not Patterns.stats_enabled:
+            return function(text)
+
+        start = time.perf_counter()
+        result = function(text)
+        Patterns.record(name, bool(result), time.perf_counter() - start)
+        return result
+
+    @staticmethod
+    def search(name, text):
+        return Patterns.run(name, 'search', text)
+
+    @staticmethod
+    def match(name, text):
+        return Patterns.run(name, 'match', text)
+
+    @staticmethod
+    def findall(name, text):
+        return Patterns.run(name, 'findall', text)
+
+    @staticmethod
+    def get_stats():
+        # Most expensive patterns first
+        with Patterns.stats_lock:
+            rows = [
+                {'pattern': name, 'hits': hits, 'misses': misses, 'seconds': round(seconds, 6)}
+                for name, (hits, misses, seconds) in Patterns.stats.items()
+            ]
+        return sorted(rows, key=lambda row: row['seconds'], reverse=True)
+
+    @staticmethod
+    def report_stats(stop_event, interval):
+        while not stop_event.wait(interval):
+            for row in Patterns.get_stats()[:10]:
+                logger.info(f"Pattern stats: {row}")
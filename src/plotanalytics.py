@@ -0,0 +1,183 @@
+import threading
+import time
+
+from collections import deque
+
+from src.logger import logger
+from src.nexus import Nexus
+from src.utils import Utils
+
+
+class PlotAnalytics:
+    # Rolling sector timings per farm and per cluster plotter, kept in
+    # ring buffers of the last max_sectors sectors and sent to Nexus every
+    # interval seconds as one small plot_stats upsert per farm or plotter
+    # that plotted since the last one, so Nexus does not have to derive
+    # them from the raw plot rows. Times are the log timestamps, so
+    # backfilled lines count at the time they were logged.
+    #
+    # A farm's sector time is the time between two of its sectors, a
+    # plotter's the time from a sector request to the finished sector.
+    # Rates only count sectors of the last window seconds.
+    farm_events = ('Plotting Sector', 'Replotting Sector')
+    plotter_events = ('Plot Sector Request', 'Finished Plotting Sector')
+
+    def __init__(self, nexus_url, interval=60, window=3600, max_sectors=512, max_requests=4096):
+        self.nexus_url = nexus_url
+        self.interval = interval
+        self.window = window
+        self.max_sectors = max_sectors
+        self.max_requests = max_requests
+        self.lock = threading.Lock()
+
+        # (container_id, farm_index) or container_id -> its window
+        self.farms = {}
+        self.plotters = {}
+        # (container_id, public_key, sector_index) -> time of the request,
+        # oldest first
+        self.requests = {}
+        self.sent = 0
+
+    def new_window(self, container_alias):
+        return {
+            'container_alias': container_alias,
+            'plot_type': None,
+            # (time, plot percentage) of each sector
+            'sectors': deque(maxlen=self.max_sectors),
+            'durations': deque(maxlen=self.max_sectors),
+            'last': None,
+            'changed': False,
+        }
+
+    def add(self, event, container_id, container_alias):
+        if event.name in PlotAnalytics.farm_events:
+            self.add_farm_sector(event, container_id, container_alias)
+        elif event.name in PlotAnalytics.plotter_events:
+            self.add_plotter_sector(event, container_id, container_alias)
+
+    def add_farm_sector(self, event, container_id, container_alias):
+        at = Utils.to_epoch(event.datetime)
+        data = event.data
+
+        with self.lock:
+            key = (container_id, data.get('farm_index'))
+            window = self.farms.get(key)
+            if window is None:
+                window = self.farms[key] = self.new_window(container_alias)
+
+            # Replotting starts its percentage over
+            if window['plot_type'] != data.get('plot_type'):
+                window['plot_type'] = data.get('plot_type')
+                window['sectors'].clear()
+                window['durations'].clear()
+                window['last'] = None
+
+            if window['last'] is not None and at >= window['last']:
+                window['durations'].append((at, at - window['last']))
+            window['last'] = at
+            window['sectors'].append((at, data.get('plot_percentage')))
+            window['changed'] = True
+
+    def add_plotter_sector(self, event, container_id, container_alias):
+        at = Utils.to_epoch(event.datetime)
+        request = (container_id, event.data.get('public_key'), event.data.get('sector_index'))
+
+        with self.lock:
+            if event.name == 'Plot Sector Request':
+                self.requests[request] = at
+                if len(self.requests) > self.max_requests:
+                    del self.requests[next(iter(self.requests))]
+                return
+
+            window = self.plotters.get(container_id)
+            if window is None:
+                window = self.plotters[container_id] = self.new_window(container_alias)
+
+            requested = self.requests.pop(request, None)
+            if requested is not None and at >= requested:
+                window['durations'].append((at, at - requested))
+            window['sectors'].append((at, None))
+            window['changed'] = True
+
+    @staticmethod
+    def percentile(values, share):
+        return values[min(len(values) - 1, int(len(values) * share))]
+
+    def summarize(self, window, now):
+        since = now - self.window
+        sectors = [sector for sector in window['sectors'] if sector[0] >= since]
+        durations = sorted(duration for at, duration in window['durations'] if at >= since)
+
+        summary = {
+            'container_alias': window['container_alias'],
+            'sectors': len(sectors),
+            'sectors_per_hour': None,
+            'sector_seconds_p50': round(PlotAnalytics.percentile(durations, 0.50), 1) if durations else None,
+            'sector_seconds_p95': round(PlotAnalytics.percentile(durations, 0.95), 1) if durations else None,
+        }
+
+        if len(sectors) >= 2 and sectors[-1][0] > sectors[0][0]:
+            span = sectors[-1][0] - sectors[0][0]
+            summary['sectors_per_hour'] = round((len(sectors) - 1) * 3600 / span, 2)
+
+        return summary, sectors
+
+    def get_summaries(self, now=None):
+        # Farms and plotters that plotted since the previous call
+        now = now or time.time()
+        summaries = []
+
+        with self.lock:
+            for (container_id, farm_index), window in self.farms.items():
+                if not window['changed']:
+                    continue
+                window['changed'] = False
+
+                summary, sectors = self.summarize(window, now)
+                summary.update({
+                    'container_id': container_id,
+                    'farm_index': farm_index,
+                    'plot_type': window['plot_type'],
+                    'plot_percentage': window['sectors'][-1][1],
+                    'eta_hours': None,
+                })
+
+                # Hours to 100% at the pace of the window
+                first, last = (sectors[0], sectors[-1]) if sectors else (None, None)
+                if first and last[0] > first[0] and first[1] is not None and last[1] is not None and last[1] > first[1]:
+                    pace = (last[1] - first[1]) / (last[0] - first[0])
+                    summary['eta_hours'] = round((100 - last[1]) / pace / 3600, 2)
+
+                summaries.append(summary)
+
+            for container_id, window in self.plotters.items():
+                if not window['changed']:
+                    continue
+                window['changed'] = False
+
+                summary, _ = self.summarize(window, now)
+                summary.update({
+                    'container_id': container_id,
+                    'farm_index': None,
+                    'plot_type': None,
+                    'plot_percentage': None,
+                    'eta_hours': None,
+                })
+                summaries.append(summary)
+
+        return summaries
+
+    def push(self):
+        summaries = self.get_summaries()
+        for summary in summaries:
+            Nexus.upsert_entity(self.nexus_url, 'plot_stats', summary, low_value=True)
+        self.sent += len(summaries)
+
+    def start_push(self, stop_event):
+        logger.info(f"Sending plotting summaries every {self.interval}s")
+
+        while not stop_event.wait(self.interval):
+            self.push()
+
+        self.push()
+        logger.info(f"Plot analytics stopped: {self.sent} summaries sent")
@@ -0,0 +1,51 @@
+import re
+import threading
+
+from src.logger import logger
+from src.patterns import Patterns
+
+
+class Prefilter:
+    # Bytes-level test for whether a raw log line can become a useful
+    # event, run by LogReader before a line is copied, decoded or parsed.
+    # A line passes if its level is not INFO, which parse_event turns into
+    # a generic event, or if it contains the trigger keyword of a rule
+    # whose events handle_event does something with. Two patterns, because
+    # a leading anchored branch would stop re from skipping ahead on the
+    # keywords' first characters.
+    def __init__(self, keywords):
+        self.level = Patterns.register('prefilter_level', rb'\s*\S+\s+(?!INFO\s)\w+\s')
+        self.keywords = Patterns.register('prefilter_keywords', b'|'.join(re.escape(keyword.encode('utf-8')) for keyword in keywords))
+
+        # Counted per read by LogReader, not per line
+        self.lock = threading.Lock()
+        self.lines = 0
+        self.passed = 0
+        self.reported = (0, 0)
+
+    def test(self, line):
+        # line is raw bytes or a memoryview over them
+        return self.level.match(line) is not None or self.keywords.search(line) is not None
+
+    def record(self, lines, passed):
+        with self.lock:
+            self.lines += lines
+            self.passed += passed
+
+    def get_stats(self):
+        # Totals and the lines skipped since the previous call
+        with self.lock:
+            lines = self.lines - self.reported[0]
+            skipped = lines - (self.passed - self.reported[1])
+            self.reported = (self.lines, self.passed)
+
+            return {
+                'lines': lines,
+                'skipped': skipped,
+                'skipped_pct': round(skipped / lines * 100, 1) if lines else 0.0,
+                'total_skipped_pct': round((self.lines - self.passed) / self.lines * 100, 1) if self.lines else 0.0,
+            }
+
+    def report_stats(self, stop_event, interval):
+        while not stop_event.wait(interval):
+            logger.info(f"Prefilter stats: {self.get_stats()}")
@@ -1,20 +1,36 @@
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor, as_completed, TimeoutError as FuturesTimeout
+
 from src.logger import logger
 from src.utils import Utils
 from src.nexus import Nexus
+from src.containerstats import ContainerStats
 
 class ResourceMonitor:
+    # Also send block I/O and network rates with each container
+    io_stats = False
+
+    # CgroupReader for containers whose cgroup is visible, see sync_stats
+    cgroup_reader = None
+
+    # Duration of the polling cycles, see get_cycle_stats
+    cycle_lock = threading.Lock()
+    cycle_stats = {'cycles': 0, 'last_seconds': 0, 'max_seconds': 0, 'total_seconds': 0.0, 'containers': 0, 'failed': 0, 'overruns': 0}
+
     @staticmethod
-    def get_container_ip(container):
+    def get_container_ip(attrs):
         try:
             # Get the network mode of the container
-            network_mode = container.attrs.get('HostConfig', {}).get('NetworkMode', '')
+            network_mode = attrs.get('HostConfig', {}).get('NetworkMode', '')
             
             # Get the IP address based on the network mode
-            container_ip = container.attrs.get('NetworkSettings', {}).get('Networks', {}).get(network_mode, {}).get('IPAddress', '')
+            container_ip = attrs.get('NetworkSettings', {}).get('Networks', {}).get(network_mode, {}).get('IPAddress', '')
             
             # If IP address is not found using the network mode, search through the networks
             if not container_ip:
-                networks = container.attrs.get('NetworkSettings', {}).get('Networks', {})
+                networks = attrs.get('NetworkSettings', {}).get('Networks', {})
                 for network_name, network_data in networks.items():
                     if network_data.get('NetworkID') == network_mode:
                         container_ip = network_data.get('IPAddress', '')
@@ -36,73 +52,197 @@ class ResourceMonitor:
     @staticmethod
     def monitor_host(docker_client, host_ip):
         try:
-            host = docker_client.info()
-
-            return {
-                'host_name': host['Name'],
-                'host_os': host['OperatingSystem'],
-                'host_cpus': host['NCPU'],
-                'host_memory': round(host['MemTotal'] / (1024 ** 3), 2),
-                'host_ip': host_ip,
-            }
+            return ResourceMonitor.summarize_host(docker_client.info(), host_ip)
 
         except Exception as e:
             logger.error("Error monitoring host:", exc_info=e)
 
     @staticmethod
-    def monitor_container(docker_client, container_data, host_name):
+    def summarize_host(host, host_ip):
+        return {
+            'host_name': host['Name'],
+            'host_os': host['OperatingSystem'],
+            'host_cpus': host['NCPU'],
+            'host_memory': round(host['MemTotal'] / (1024 ** 3), 2),
+            'host_ip': host_ip,
+        }
+
+    @staticmethod
+    def monitor_container(docker_client, container_data, host_name, image_labels, container_stats=None):
         try:
             container = docker_client.containers.get(container_data['container_id'])
-            container.reload()
 
-            container_ip = ResourceMonitor.get_container_ip(container)
+            # Prefer the locally computed usage from cgroupfs or the stats
+            # stream, the one-shot call makes Docker wait a second to sample precpu
+            usage = container_stats.current_usage(ResourceMonitor.cgroup_reader) if container_stats else None
+            if usage is None:
+                usage = ContainerStats.oneshot(container.stats(stream=False))
+
+            # Images do not change under a container, inspect each one once
+            if container.attrs['Image'] not in image_labels:
+                image_labels[container.attrs['Image']] = container.image.labels
 
-            stats = container.stats(stream=False)
-            memory_usage = stats['memory_stats']['stats']['active_anon'] + stats['memory_stats']['stats']['active_file']
-            memory_limit = stats['memory_stats']['limit']
-            total_usage = stats['cpu_stats']['cpu_usage']['total_usage']
-            system_cpu_usage = stats['cpu_stats']['system_cpu_usage']
+            return ResourceMonitor.summarize_container(container_data, host_name, container.attrs, image_labels[container.attrs['Image']], usage)
 
-            # Calculate memory usage percentage
-            memory_usage_percentage = round((memory_usage / memory_limit) * 100, 3)
+        except Exception as e:
+            logger.error("Error monitoring container:", exc_info=e)
 
-            # Calculate CPU usage percentage
-            cpu_delta = total_usage - stats['precpu_stats']['cpu_usage']['total_usage']
-            system_cpu_delta = system_cpu_usage - stats['precpu_stats']['system_cpu_usage']
-            cpu_usage_percentage = round((cpu_delta / system_cpu_delta) * 100, 3)
+    @staticmethod
+    def summarize_container(container_data, host_name, attrs, image_labels, usage):
+        # Build the container entity from the raw inspect document and the
+        # usage computed by ContainerStats, shared by the thread and asyncio
+        # runtimes
+        container_ip = ResourceMonitor.get_container_ip(attrs)
+
+        nats_url = ResourceMonitor.get_nats_url(attrs['Config']['Cmd'])
+
+        container = {
+            'container_id': container_data['container_id'],
+            'host_name': host_name,
+            'container_name': container_data['container_name'],
+            'container_alias': container_data['container_alias'],
+            'container_image': image_labels["org.opencontainers.image.version"],
+            'container_status': attrs['State']['Status'],
+            'container_type': container_data['container_type'],
+            'container_started_at': Utils.normalize_date(attrs.get('State').get('StartedAt')),
+            'container_ip': container_ip,
+            'container_mem_usage_pct': usage['mem_pct'],
+            'container_cpu_usage_pct': usage['cpu_pct'],
+            'nats_url': nats_url,
+            'is_cluster': 1 if nats_url else 0
+        }
+
+        # Only sent when asked for, older Nexus versions do not know them
+        if ResourceMonitor.io_stats:
+            container['container_blk_read_bps'] = usage['blk_read_bps']
+            container['container_blk_write_bps'] = usage['blk_write_bps']
+            container['container_net_rx_bps'] = usage['net_rx_bps']
+            container['container_net_tx_bps'] = usage['net_tx_bps']
+
+        return container
 
-            nats_url = ResourceMonitor.get_nats_url(container.attrs['Config']['Cmd'])
+    @staticmethod
+    def record_cycle(duration, containers, failed, interval):
+        with ResourceMonitor.cycle_lock:
+            stats = ResourceMonitor.cycle_stats
+            stats['cycles'] += 1
+            stats['last_seconds'] = round(duration, 3)
+            stats['max_seconds'] = round(max(stats['max_seconds'], duration), 3)
+            stats['total_seconds'] += duration
+            stats['containers'] = containers
+            stats['failed'] += failed
+            if duration > interval:
+                stats['overruns'] += 1
+
+        if duration > interval:
+            logger.warning(f"Resource monitor cycle took {duration:.1f}s for {containers} containers, longer than the {interval}s interval")
 
+    @staticmethod
+    def get_cycle_stats():
+        with ResourceMonitor.cycle_lock:
+            stats = dict(ResourceMonitor.cycle_stats)
 
-            return {
-                'container_id': container_data['container_id'],
-                'host_name': host_name,
-                'container_name': container_data['container_name'],
-                'container_alias': container_data['container_alias'],
-                'container_image': container.image.labels["org.opencontainers.image.version"],
-                'container_status': container.status,
-                'container_type': container_data['container_type'],
-                'container_started_at': Utils.normalize_date(container.attrs.get('State').get('StartedAt')),
-                'container_ip': container_ip,
-                'container_mem_usage_pct': memory_usage_percentage,
-                'container_cpu_usage_pct': cpu_usage_percentage,
-                'nats_url': nats_url,
-                'is_cluster': 1 if nats_url else 0
-            }
+        stats['avg_seconds'] = round(stats.pop('total_seconds') / stats['cycles'], 3) if stats['cycles'] else 0
+        return stats
 
+    @staticmethod
+    def report_cycle_stats(stop_event, interval):
+        while not stop_event.wait(interval):
+            logger.info(f"Resource monitor stats: {ResourceMonitor.get_cycle_stats()}")
 
-        except Exception as e:
-            logger.error("Error monitoring container:", exc_info=e)
+    @staticmethod
+    def sync_stats(container_stats, discovery, follow=None):
+        # Keeps one ContainerStats per running container as discovery adds
+        # and removes them. cgroupfs is sampled right away so the first
+        # cycle already has a delta, otherwise follow(stats) starts a stats
+        # stream when streams are enabled. Returns the ContainerStats of
+        # containers that stopped, already stopped.
+        running = {container['container_id'] for container in discovery.snapshot() if discovery.is_running(container['container_id'])}
+
+        removed = []
+        for container_id in list(container_stats):
+            if container_id not in running:
+                stats = container_stats.pop(container_id)
+                stats.stop()
+                removed.append(stats)
+
+        for container_id in running - container_stats.keys():
+            stats = ContainerStats(container_id)
+            if ResourceMonitor.cgroup_reader and stats.sample(ResourceMonitor.cgroup_reader):
+                stats.from_cgroup = True
+            elif follow:
+                follow(stats)
+            else:
+                continue
+            container_stats[container_id] = stats
+
+        return removed
 
     @staticmethod
-    def start_monitor(containers, docker_client, stop_event, nexus_url, host_ip):
-        logger.info(f"Starting Resource monitor for {len(containers)} containers on Host IP {host_ip}.")
+    def start_monitor(discovery, docker_client, stop_event, nexus_url, host_ip, interval=10, workers=8, stats_stream=True):
+        logger.info(f"Starting Resource monitor for {len(discovery.snapshot())} containers on Host IP {host_ip}.")
         host = ResourceMonitor.monitor_host(docker_client, host_ip)
         Nexus.upsert_entity(nexus_url, 'host', host)
 
-        while not stop_event.is_set():
-            for container_data in containers:
-                container = ResourceMonitor.monitor_container(docker_client, container_data, host['host_name'])
-                Nexus.upsert_entity(nexus_url, 'container', container)
+        # cgroupfs where it is mounted, otherwise one long-lived stats
+        # subscription per running container. Each cycle then only reads
+        # the latest locally computed usage.
+        def follow(stats):
+            threading.Thread(target=stats.follow, args=(docker_client, stop_event), daemon=True).start()
+
+        container_stats = {}
+
+        # Docker blocks each one-shot stats call for about a second while it
+        # samples precpu, so containers are polled in parallel, which also
+        # covers the inspect calls when stats come from streams. A container
+        # whose call is still running from an earlier cycle is skipped
+        # rather than queued a second time.
+        in_flight = {}
+        image_labels = {}
+        next_cycle = time.monotonic()
 
-            stop_event.wait(10)
\ No newline at end of file
+        executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='resource-monitor')
+
+        try:
+            while not stop_event.is_set():
+                start = time.monotonic()
+
+                # Containers come and go with discovery
+                containers = discovery.snapshot()
+                ResourceMonitor.sync_stats(container_stats, discovery, follow if stats_stream else None)
+
+                futures = {}
+                for container_data in containers:
+                    container_id = container_data['container_id']
+                    if container_id in in_flight and not in_flight[container_id].done():
+                        continue
+
+                    future = executor.submit(ResourceMonitor.monitor_container, docker_client, container_data, host['host_name'], image_labels, container_stats.get(container_id))
+                    in_flight[container_id] = future
+                    futures[future] = container_id
+
+                for container_id in in_flight.keys() - {container_data['container_id'] for container_data in containers}:
+                    del in_flight[container_id]
+
+                failed = len(containers) - len(futures)
+                try:
+                    for future in as_completed(futures, timeout=interval):
+                        container = future.result()
+                        if container:
+                            Nexus.upsert_entity(nexus_url, 'container', container, low_value=True)
+                        else:
+                            failed += 1
+                except FuturesTimeout:
+                    failed += sum(1 for future in futures if not future.done())
+
+                ResourceMonitor.record_cycle(time.monotonic() - start, len(containers), failed, interval)
+
+                # Keep a fixed period no matter how long the cycle took
+                next_cycle = max(next_cycle + interval, time.monotonic())
+                stop_event.wait(next_cycle - time.monotonic())
+
+        finally:
+            # A stats call can hang on a stuck container, do not wait for it
+            executor.shutdown(wait=False, cancel_futures=True)
+            for stats in container_stats.values():
+                stats.stop()
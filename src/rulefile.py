@@ -0,0 +1,45 @@
+import json
+import os
+
+import src.constants as constants
+from src.rules import event_rules, event_routes
+
+
+class RuleFile:
+    # event_rules, event_routes and key_events read from a JSON file, so a
+    # changed log format needs a new file instead of a new image. The file
+    # has the shape of src/rules.py with [group, type] lists as field
+    # specs, tables left out of it are the built-in ones. Whether the rules
+    # fit together is checked by StreamParser.build_rules.
+    def __init__(self, path):
+        self.path = path
+
+    def load(self):
+        with open(self.path, encoding='utf-8') as f:
+            tables = json.load(f)
+
+        if not isinstance(tables, dict):
+            raise ValueError(f"{self.path} does not hold an object with event_rules, event_routes and key_events")
+
+        rules = tables.get('event_rules', event_rules)
+        routes = tables.get('event_routes', event_routes)
+        key_events = tables.get('key_events', constants.key_events)
+
+        if not isinstance(rules, list) or not all(isinstance(rule, dict) for rule in rules):
+            raise ValueError(f"event_rules in {self.path} is not a list of rules")
+        if not isinstance(routes, dict) or not all(isinstance(route, dict) for route in routes.values()):
+            raise ValueError(f"event_routes in {self.path} is not an object of routes")
+        if not isinstance(key_events, list) or not all(isinstance(key_event, dict) and 'event_name' in key_event for key_event in key_events):
+            raise ValueError(f"key_events in {self.path} is not a list of events")
+
+        return rules, routes, key_events
+
+    def save(self, rules, routes, key_events):
+        # Written through a temporary file, a reload never sees half of it
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        with open(self.path + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump({'event_rules': rules, 'event_routes': routes, 'key_events': key_events}, f, indent=4)
+        os.replace(self.path + '.tmp', self.path)
@@ -0,0 +1,543 @@
+# Rule table used by StreamParser.parse_event.
+#
+# Each rule is selected when its trigger keyword (and every keyword in
+# 'requires') appears in the log message. When several rules match the same
+# line, the one listed last wins, which mirrors the order of the original
+# if-chain in parse_event.
+#
+# 'patterns' are applied in order and their groups are converted according
+# to 'fields' ({field: (group, type)}). A pattern that does not match makes
+# the whole rule fail, unless it is marked 'optional', in which case its
+# fields are set to 'default'. 'data' holds static fields and 'transform'
+# names an optional post-processing step registered with the EventMatcher.
+# 'samples' are log lines the rule must parse, checked whenever the rules
+# are loaded. Every rule needs at least one.
+#
+# These are the built-in tables. With --rules_path they, event_routes and
+# key_events are read from a JSON file of the same shape instead, see
+# RuleFile.
+
+event_rules = [
+    {
+        'event_name': 'Register RPC URL',
+        'event_type': 'farmer',
+        'trigger': 'Connecting to node RPC url',
+        'patterns': [
+            {'pattern': r'ws://([^ ]+)', 'fields': {'rpc_url': (1, 'str')}}
+        ],
+        'data': {'status': 'RPC URL Registered'},
+        'samples': ['2024-06-10T08:00:00.000000157Z  INFO subspace_farmer::commands::farm: Connecting to node RPC url ws://192.168.10.20:9944']
+    },
+    {
+        'event_name': 'Detecting L3 Cache Groups',
+        'event_type': 'farmer',
+        'trigger': 'l3_cache_groups',
+        'patterns': [
+            {'pattern': r'l3_cache_groups=(\d+)', 'fields': {'l3_cache_groups': (1, 'str')}}
+        ],
+        'data': {'status': 'Detecting L3 Cache Groups'},
+        'samples': ['2024-06-10T08:00:00.731000103Z  INFO subspace_farmer::commands::farm: Detecting L3 cache groups l3_cache_groups=2']
+    },
+    {
+        'event_name': 'Preparing Plotting Thread Pools',
+        'event_type': 'farmer',
+        'trigger': 'plotting_thread_pool_core_indices',
+        'patterns': [
+            {'pattern': r'plotting_thread_pool_core_indices=\[(.*?)\]', 'fields': {'plotting_cpu_sets': (1, 'cpu_sets')}, 'optional': True, 'default': ''},
+            {'pattern': r'replotting_thread_pool_core_indices=\[(.*?)\]', 'fields': {'replotting_cpu_sets': (1, 'cpu_sets')}, 'optional': True, 'default': ''}
+        ],
+        'data': {'status': 'Preparing Plotting Thread Pools'},
+        'samples': ['2024-06-10T08:00:01.462000737Z  INFO subspace_farmer::commands::farm: Preparing plotting thread pools plotting_thread_pool_core_indices=[CpuSet(0,1,2,3,4,5,6,7), CpuSet(8,9,10,11,12,13,14,15)] replotting_thread_pool_core_indices=[CpuSet(0,1,2,3,4,5,6,7), CpuSet(8,9,10,11,12,13,14,15)]']
+    },
+    {
+        'event_name': 'Checking Plot Cache Contents',
+        'event_type': 'farm',
+        'trigger': 'Checking plot cache contents',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+)', 'fields': {'farm_index': (1, 'str')}}
+        ],
+        'data': {'status': 'Checking Plot Cache Contents'},
+        'samples': ['2024-06-10T08:00:07.310000631Z  INFO {farm_index=0}:subspace_farmer::single_disk_farm::plot_cache: Checking plot cache contents']
+    },
+    {
+        'event_name': 'Finished Checking Plot Cache Contents',
+        'event_type': 'farm',
+        'trigger': 'Finished checking plot cache contents',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+)', 'fields': {'farm_index': (1, 'str')}}
+        ],
+        'data': {'status': 'Finished Checking Plot Cache Contents'},
+        'samples': ['2024-06-10T08:00:08.041000097Z  INFO {farm_index=0}:subspace_farmer::single_disk_farm::plot_cache: Finished checking plot cache contents']
+    },
+    {
+        'event_name': 'Downloading Segment Headers',
+        'event_type': 'farmer',
+        'trigger': 'Downloading all segment headers from node',
+        'data': {'status': 'Downloading Segment Headers'},
+        'samples': ['2024-06-10T08:00:02.193000544Z  INFO subspace_farmer::commands::farm: Downloading all segment headers from node...']
+    },
+    {
+        'event_name': 'Downloaded All Segment Headers',
+        'event_type': 'farmer',
+        'trigger': 'Downloaded all segment headers from node successfully',
+        'data': {'status': 'Downloaded All Segment Headers'},
+        'samples': ['2024-06-10T08:00:02.924000183Z  INFO subspace_farmer::commands::farm: Downloaded all segment headers from node successfully']
+    },
+    {
+        'event_name': 'NATs Connected',
+        'event_type': 'farmer',
+        'trigger': 'async_nats: event: connected',
+        'data': {'nats_connected': 1},
+        'samples': ['2024-06-10T08:00:59.942000946Z  INFO async_nats: event: connected']
+    },
+    {
+        'event_name': 'NATs Disconnected',
+        'event_type': 'farmer',
+        'trigger': 'async_nats: event: disconnected',
+        'data': {'nats_connected': 0},
+        'samples': ['2024-06-10T08:00:03.655000302Z  INFO async_nats: event: disconnected']
+    },
+    {
+        'event_name': 'Benchmarking Proving Method',
+        'event_type': 'farm',
+        'trigger': 'Benchmarking faster proving method',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+)', 'fields': {'farm_index': (1, 'str')}}
+        ],
+        'data': {'status': 'Benchmarking Proving Method'},
+        'samples': ['2024-06-10T08:00:08.772000022Z  INFO {farm_index=0}:subspace_farmer::single_disk_farm: Benchmarking faster proving method']
+    },
+    {
+        'event_name': 'Subscribing to Slot Info Notifications',
+        'event_type': 'farm',
+        'trigger': 'Subscribing to slot info notifications',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+)', 'fields': {'farm_index': (1, 'str')}}
+        ],
+        'data': {'status': 'Subscribing to Slot Info Notifications'},
+        'samples': ['2024-06-10T08:00:10.234000828Z  INFO {farm_index=0}:subspace_farmer::single_disk_farm::farming: Subscribing to slot info notifications']
+    },
+    {
+        'event_name': 'Subscribing to Reward Signing Notifications',
+        'event_type': 'farm',
+        'trigger': 'Subscribing to reward signing notifications',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+)', 'fields': {'farm_index': (1, 'str')}}
+        ],
+        'data': {'status': 'Subscribing to Reward Signing Notifications'},
+        'samples': ['2024-06-10T08:00:10.965000281Z  INFO {farm_index=0}:subspace_farmer::single_disk_farm::reward_signing: Subscribing to reward signing notifications']
+    },
+    {
+        'event_name': 'Subscribing to Archived Segments',
+        'event_type': 'farm',
+        'trigger': 'Subscribing to archived segments',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+)', 'fields': {'farm_index': (1, 'str')}}
+        ],
+        'data': {'status': 'Subscribing to Archived Segments'},
+        'samples': ['2024-06-10T08:00:11.696000904Z  INFO {farm_index=0}:subspace_farmer::single_disk_farm::plotting: Subscribing to archived segments']
+    },
+    {
+        'event_name': 'Found Fastest Mode',
+        'event_type': 'farm',
+        'trigger': 'fastest_mode',
+        'patterns': [
+            {'pattern': r'\{farm_index=(\d+)\}.*fastest_mode=(\w+)', 'fields': {'farm_index': (1, 'str'), 'fastest_mode': (2, 'str')}}
+        ],
+        'data': {'status': 'Found Fastest Mode'},
+        'samples': ['2024-06-10T08:00:09.503000787Z  INFO {farm_index=0}:subspace_farmer::single_disk_farm: Found fastest mode fastest_mode=ConcurrentChunks']
+    },
+    {
+        'event_name': 'Register Farm ID',
+        'event_type': 'farm',
+        'trigger': 'ID:',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+)', 'fields': {'farm_index': (1, 'str')}},
+            {'pattern': r'ID:\s+(\S+)', 'fields': {'farm_id': (1, 'str')}}
+        ],
+        'data': {'status': 'Register Farm ID'},
+        'samples': ['2024-06-10T08:00:03.655000072Z  INFO {farm_index=0}:subspace_farmer::commands::farm: ID: 01JW705256PF111PYX95B70ZF4']
+    },
+    {
+        'event_name': 'Register Genesis Hash',
+        'event_type': 'farm',
+        'trigger': 'Genesis hash:',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+)', 'fields': {'farm_index': (1, 'str')}},
+            {'pattern': r'Genesis hash:\s+(0x\S+)', 'fields': {'farm_genesis_hash': (1, 'str')}}
+        ],
+        'data': {'status': 'Register Genesis Hash'},
+        'samples': ['2024-06-10T08:00:04.386000633Z  INFO {farm_index=0}:subspace_farmer::commands::farm: Genesis hash: 0xe221829fb876e020a4fc512f52640b349e1d8158494e1cbfaef1f5ee9835dd33']
+    },
+    {
+        'event_name': 'Register Public Key',
+        'event_type': 'farm',
+        'trigger': 'Public key:',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+)', 'fields': {'farm_index': (1, 'str')}},
+            {'pattern': r'Public key:\s+(0x[0-9a-fA-F]+)', 'fields': {'farm_public_key': (1, 'str')}}
+        ],
+        'data': {'status': 'Initializing'},
+        'samples': ['2024-06-10T08:00:05.117000588Z  INFO {farm_index=0}:subspace_farmer::commands::farm: Public key: 0xfc86b3584ae22c619172a9e282d63c6e7b6d5691b4ffa441542a5012461dca6c']
+    },
+    {
+        'event_name': 'Register Allocated Space',
+        'event_type': 'farm',
+        'trigger': 'Allocated space:',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+).*Allocated space:\s+([\d.]+)\s+(GiB|TiB|GB|TB)\s+\(([\d.]+)\s+(GiB|TiB|GB|TB)\)', 'fields': {'farm_index': (1, 'int'), 'farm_size': (2, 'float'), 'farm_size_unit': (3, 'str')}}
+        ],
+        'data': {'status': 'Register Allocated Space'},
+        'transform': 'allocated_space',
+        'samples': ['2024-06-10T08:00:05.848000533Z  INFO {farm_index=0}:subspace_farmer::commands::farm: Allocated space: 900.0 GiB (966.4 GB)']
+    },
+    {
+        'event_name': 'Register Directory',
+        'event_type': 'farm',
+        'trigger': 'Directory:',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+).*Directory:\s+(.+)', 'fields': {'farm_index': (1, 'int'), 'farm_directory': (2, 'str')}}
+        ],
+        'data': {'status': 'Register Directory'},
+        'samples': ['2024-06-10T08:00:06.579000846Z  INFO {farm_index=0}:subspace_farmer::commands::farm: Directory: /subspace/farm0']
+    },
+    {
+        'event_name': 'Collecting Plotted Pieces',
+        'event_type': 'farmer',
+        'trigger': 'Collecting already plotted pieces',
+        'data': {'status': 'Collecting Plotted Pieces'},
+        'samples': ['2024-06-10T08:00:38.743000474Z  INFO subspace_farmer::utils::farmer_piece_getter: Collecting already plotted pieces']
+    },
+    {
+        'event_name': 'Finished Collecting Plotted Pieces',
+        'event_type': 'farmer',
+        'trigger': 'Finished collecting already plotted pieces successfully',
+        'data': {'status': 'Finished Collecting Plotted Pieces'},
+        'samples': ['2024-06-10T08:00:39.474000579Z  INFO subspace_farmer::utils::farmer_piece_getter: Finished collecting already plotted pieces successfully']
+    },
+    {
+        'event_name': 'Initializing Piece Cache',
+        'event_type': 'farmer',
+        'trigger': 'Initializing piece cache',
+        'data': {'status': 'Initializing Piece Cache'},
+        'samples': ['2024-06-10T08:00:40.205000941Z  INFO subspace_farmer::farmer_cache: Initializing piece cache']
+    },
+    {
+        'event_name': 'Syncronizing Piece Cache',
+        'event_type': 'farmer',
+        'trigger': 'Synchronizing piece cache',
+        'data': {'status': 'Syncronizing Piece Cache'},
+        'samples': ['2024-06-10T08:00:40.936000721Z  INFO subspace_farmer::farmer_cache: Synchronizing piece cache']
+    },
+    {
+        'event_name': 'Piece Cache Sync',
+        'event_type': 'farmer',
+        'trigger': 'Piece cache sync',
+        'patterns': [
+            {'pattern': r'Piece cache sync (\d+\.\d+)% complete', 'fields': {'piece_cache_pct': (1, 'float')}}
+        ],
+        'data': {'status': 'Syncronizing Piece Cache'},
+        'samples': ['2024-06-10T08:00:46.784000695Z  INFO subspace_farmer::farmer_cache: Piece cache sync 0.37% complete']
+    },
+    {
+        'event_name': 'Finished Piece Cache Syncronization',
+        'event_type': 'farmer',
+        'trigger': 'Finished piece cache synchronization',
+        'data': {'status': 'Piece Cache Syncronized', 'piece_cache_pct': 100.00},
+        'samples': ['2024-06-10T08:00:00.000000000Z  INFO subspace_farmer::farmer_cache: Finished piece cache synchronization']
+    },
+    {
+        'event_name': 'Plotting Sector',
+        'event_type': 'farm',
+        'trigger': 'Plotting sector',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+).*?(\d+\.\d+)% complete.*?sector_index=(\d+)', 'fields': {'farm_index': (1, 'int'), 'plot_percentage': (2, 'float'), 'plot_current_sector': (3, 'int')}}
+        ],
+        'data': {'plot_type': 'Plot', 'status': 'Plotting Sector'},
+        'samples': ['2024-06-10T08:00:41.667000602Z  INFO {farm_index=3}:subspace_farmer::single_disk_farm::plotting: Plotting sector (80.00% complete) sector_index=1']
+    },
+    {
+        'event_name': 'Signed Reward Hash',
+        'event_type': 'farm',
+        'trigger': 'Successfully signed reward hash',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+).*hash\s(0x[0-9a-fA-F]+)', 'fields': {'farm_index': (1, 'str'), 'reward_hash': (2, 'str')}}
+        ],
+        'data': {'reward_type': 'Reward'},
+        'samples': ['2024-06-10T08:00:50.439000438Z  INFO {farm_index=0}:subspace_farmer::reward_signing: Successfully signed reward hash 0x417a3beda4a327828eca7f693393c6b4095e6b34d15aaa774ef1a39c8de717d1']
+    },
+    {
+        'event_name': 'Initial Plotting Complete',
+        'event_type': 'farm',
+        'trigger': 'Initial plotting complete',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+)', 'fields': {'farm_index': (1, 'int')}}
+        ],
+        'data': {'plot_percentage': 100, 'plot_current_sector': None, 'plot_type': 'Plot', 'status': 'Farming'},
+        'samples': ['2024-06-10T08:00:00.000000000Z  INFO {farm_index=0}:subspace_farmer::single_disk_farm::plotting: Initial plotting complete']
+    },
+    {
+        'event_name': 'Replotting Sector',
+        'event_type': 'farm',
+        'trigger': 'Replotting sector',
+        'requires': ['complete'],
+        'patterns': [
+            {'pattern': r'farm_index=(\d+).*?(\d+\.\d+)% complete.*?sector_index=(\d+)', 'fields': {'farm_index': (1, 'int'), 'plot_percentage': (2, 'float'), 'plot_current_sector': (3, 'int')}}
+        ],
+        'data': {'plot_type': 'Replot', 'status': 'Replotting Sector'},
+        'samples': ['2024-06-10T08:01:00.673000278Z  INFO {farm_index=2}:subspace_farmer::single_disk_farm::plotting: Replotting sector (37.21% complete) sector_index=825']
+    },
+    {
+        'event_name': 'Replotting Complete',
+        'event_type': 'farm',
+        'trigger': 'Replotting complete',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+)', 'fields': {'farm_index': (1, 'int')}}
+        ],
+        'data': {'plot_percentage': 100, 'plot_current_sector': None, 'plot_type': 'Replot', 'status': 'Farming'},
+        'samples': ['2024-06-10T08:00:00.000000000Z  INFO {farm_index=0}:subspace_farmer::single_disk_farm::plotting: Replotting complete']
+    },
+    {
+        'event_name': 'Failed to Send Solution',
+        'event_type': 'farmer',
+        'trigger': 'Failed to send solution',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+)', 'fields': {'farm_index': (1, 'int')}}
+        ],
+        'data': {'reward_hash': None, 'reward_type': 'Failed'},
+        'samples': ['2024-06-10T08:02:13.773000522Z  WARN {farm_index=2}:subspace_farmer::single_disk_farm::farming: Failed to send solution slot=17997124 sector_index=642 error="timeout"']
+    },
+    {
+        'event_name': 'Finished Plotting Sector',
+        'event_type': 'farmer',
+        'trigger': 'Finished plotting sector successfully',
+        'patterns': [
+            {'pattern': r'public_key=([a-f0-9]+)', 'fields': {'public_key': (1, 'str')}, 'optional': True, 'default': None},
+            {'pattern': r'sector_index=(\d+)', 'fields': {'sector_index': (1, 'str')}, 'optional': True, 'default': None}
+        ],
+        'data': {'status': 'Finished Plotting Sector'},
+        'samples': ['2024-06-10T08:00:04.386000088Z  INFO subspace_farmer::cluster::plotter: Finished plotting sector successfully public_key=b37fa1b457f6772792a74b6774ebac7c58c1e51175b281c76a940008341b67ef sector_index=4939']
+    },
+    {
+        'event_name': 'Plot Sector Request',
+        'event_type': 'farmer',
+        'trigger': 'Plot sector request',
+        'patterns': [
+            {'pattern': r'public_key=([a-f0-9]+)', 'fields': {'public_key': (1, 'str')}, 'optional': True, 'default': None},
+            {'pattern': r'sector_index=(\d+)', 'fields': {'sector_index': (1, 'str')}, 'optional': True, 'default': None}
+        ],
+        'data': {'status': 'Plot Sector Request'},
+        'samples': ['2024-06-10T08:00:02.924000329Z  INFO subspace_farmer::cluster::plotter: Plot sector request public_key=c493fc1bf4fd4cb68c5219021b8171b406ffa35f602e82e6564e4f87d2e42bc9 sector_index=145']
+    },
+    {
+        'event_name': 'New Cache Discovered',
+        'event_type': 'farmer',
+        'trigger': 'New cache discovered',
+        'patterns': [
+            {'pattern': r'cache_id=([A-Z0-9]+)', 'fields': {'cache_id': (1, 'str')}}
+        ],
+        'samples': ['2024-06-10T08:00:07.310000134Z  INFO subspace_farmer::cluster::controller::caches: New cache discovered cache_id=01JCFZK4NF280NGNF5YA26P7T1']
+    },
+    {
+        'event_name': 'Farm Initialized Successfully',
+        'event_type': 'farmer',
+        'trigger': 'Farm initialized successfully',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+)', 'fields': {'farm_index': (1, 'str')}},
+            {'pattern': r'farm_id=([A-Z0-9]+)', 'fields': {'farm_id': (1, 'str')}}
+        ],
+        'samples': ['2024-06-10T08:00:00.731000546Z  INFO subspace_farmer::cluster::controller::farms: Farm initialized successfully farm_index=18 farm_id=01J932G4GWNE5MS43H4G5R00JR']
+    },
+    {
+        'event_name': 'Discovered New Farm',
+        'event_type': 'farmer',
+        'trigger': 'Discovered new farm',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+)', 'fields': {'farm_index': (1, 'str')}},
+            {'pattern': r'farm_id=([A-Z0-9]+)', 'fields': {'farm_id': (1, 'str')}}
+        ],
+        'samples': ['2024-06-10T08:00:13.158000929Z  INFO subspace_farmer::cluster::controller::farms: Discovered new farm farm_index=11 farm_id=01J5SYZ9DZKX4QTHFYPGTRX2DE']
+    },
+    {
+        'event_name': 'Idle',
+        'event_type': 'node',
+        'trigger': 'Idle',
+        'requires': ['best:'],
+        'patterns': [
+            {'pattern': r'Idle \((?P<peers>\d+) peers\), best: #(?P<best>\d+).*finalized #(?P<finalized>\d+).*⬇ (?P<down_speed>\d+(?:\.\d+)?)(?P<down_unit>\s?[kKMmGg]?[iI]?[bB]/s) ⬆ (?P<up_speed>\d+(?:\.\d+)?)(?P<up_unit>\s?[kKMmGg]?[iI]?[bB]/s)', 'fields': {'peers': ('peers', 'int'), 'best': ('best', 'int'), 'finalized': ('finalized', 'int'), 'down_speed': ('down_speed', 'float'), 'up_speed': ('up_speed', 'float'), 'down_unit': ('down_unit', 'str'), 'up_unit': ('up_unit', 'str')}}
+        ],
+        'data': {'status': 'Idle', 'target': None, 'bps': None},
+        'samples': ['2024-06-10T08:00:00.731000942Z  INFO Consensus: substrate: 💤 Idle (34 peers), best: #1500001 (0x191e…9025), finalized #1499901 (0x2bcd…3942), ⬇ 341.7kiB/s ⬆ 287.7MiB/s']
+    },
+    {
+        'event_name': 'Preparing',
+        'event_type': 'node',
+        'trigger': 'Preparing',
+        'requires': ['target='],
+        'patterns': [
+            {
+                'pattern': (
+                    r'(?:(?P<bps>\d+\.\d+)\s+bps,\s*)?'  # Optional bps
+                    r'target=#(?P<target>\d+)\s+\((?P<peers>\d+)\s+peers\),\s+'  # target and peers
+                    r'best:\s+#(?P<best>\d+)\s+\([^)]*\),\s+'  # best
+                    r'finalized\s+#(?P<finalized>\d+)\s+\([^)]*\),\s+'  # finalized
+                    r'⬇\s+(?P<down>\d+(?:\.\d+)?)(?P<down_unit>kiB|MiB)/s\s+'  # download speed and unit
+                    r'⬆\s+(?P<up>\d+(?:\.\d+)?)(?P<up_unit>kiB|MiB)/s'  # upload speed and unit
+                ),
+                'fields': {'peers': ('peers', 'int'), 'best': ('best', 'int'), 'target': ('target', 'int'), 'finalized': ('finalized', 'int'), 'bps': ('bps', 'optional_float'), 'down_speed': ('down', 'float'), 'up_speed': ('up', 'float'), 'down_unit': ('down_unit', 'str'), 'up_unit': ('up_unit', 'str')}
+            }
+        ],
+        'data': {'status': 'Preparing'},
+        'samples': ['2024-06-10T08:01:24.065000550Z  INFO Consensus: substrate: ⚙️  Preparing  0.0 bps, target=#1500543 (41 peers), best: #1500043 (0x872e…300c), finalized #1499943 (0x8289…3bed), ⬇ 453.0kiB/s ⬆ 276.2kiB/s']
+    },
+    {
+        'event_name': 'Syncing',
+        'event_type': 'node',
+        'trigger': 'Syncing',
+        'requires': ['target='],
+        'patterns': [
+            {'pattern': r'Consensus: substrate: ⚙️  Syncing(?:\s+(?P<bps>\d+\.\d+) bps)?, target=#(?P<target>\d+) \((?P<peers>\d+) peers\), best: #(?P<best>\d+) \([^\)]+\), finalized #(?P<finalized>\d+) \([^\)]+\), ⬇ (?P<down_speed>\d+\.\d+)(?P<down_unit>[kKmMgG][iI]?[bB]/s) ⬆ (?P<up_speed>\d+\.\d+)(?P<up_unit>[kKmMgG][iI]?[bB]/s)', 'fields': {'peers': ('peers', 'int'), 'best': ('best', 'int'), 'target': ('target', 'int'), 'finalized': ('finalized', 'int'), 'bps': ('bps', 'optional_float'), 'down_speed': ('down_speed', 'float'), 'up_speed': ('up_speed', 'float'), 'down_unit': ('down_unit', 'str'), 'up_unit': ('up_unit', 'str')}}
+        ],
+        'data': {'status': 'Syncing'},
+        'samples': ['2024-06-10T08:00:55.556000517Z  INFO Consensus: substrate: ⚙️  Syncing 23.6 bps, target=#1500530 (28 peers), best: #1500030 (0x4af1…004b), finalized #1499930 (0x12ec…d74e), ⬇ 878.3kiB/s ⬆ 184.8kiB/s']
+    },
+    {
+        'event_name': 'Pending',
+        'event_type': 'node',
+        'trigger': 'Pending',
+        'patterns': [
+            {'pattern': r'Consensus: substrate: ⏳ Pending \((?P<peers>\d+) peers\), best: #(?P<best>\d+) \([^\)]+\), finalized #(?P<finalized>\d+) \([^\)]+\), ⬇ (?P<down_speed>\d+\.\d+)(?P<down_unit>[kKmMgG][iI]?[bB])/s ⬆ (?P<up_speed>\d+\.\d+)(?P<up_unit>[kKmMgG][iI]?[bB])/s', 'fields': {'peers': ('peers', 'int'), 'best': ('best', 'int'), 'finalized': ('finalized', 'int'), 'down_speed': ('down_speed', 'float'), 'up_speed': ('up_speed', 'float'), 'down_unit': ('down_unit', 'str'), 'up_unit': ('up_unit', 'str')}}
+        ],
+        'data': {'status': 'Pending', 'target': None, 'bps': None},
+        'samples': ['2024-06-10T08:00:28.509000143Z  INFO Consensus: substrate: ⏳ Pending (31 peers), best: #1500017 (0x189e…14f9), finalized #1499917 (0x60d9…bd52), ⬇ 682.9kiB/s ⬆ 894.3kiB/s']
+    },
+    {
+        'event_name': 'Claim',
+        'event_type': 'node',
+        'trigger': 'Claimed',
+        'patterns': [
+            {'pattern': r'slot=(\d+)', 'fields': {'slot': (1, 'int')}}
+        ],
+        'transform': 'claim_type',
+        'samples': ['2024-06-10T08:00:18.275000942Z  INFO Consensus: subspace_service::rpc: 🗳️ Claimed vote at slot slot=43928242']
+    },
+    {
+        'event_name': 'Imported',
+        'event_type': 'node',
+        'trigger': 'Imported #',
+        'samples': ['2024-06-10T08:00:00.000000101Z  INFO Consensus: substrate: ✨ Imported #1500001 (0xea4c…6a80)']
+    },
+    {
+        'event_name': 'Reorg',
+        'event_type': 'node',
+        'trigger': 'Reorg on #',
+        'samples': ['2024-06-10T08:01:25.527000622Z  INFO Consensus: sc_informant: ♻️  Reorg on #1500043,0x2b2c…861b to #1500043,0x538d…1b59, common ancestor #1500042,0x8810…f1ec']
+    },
+    {
+        'event_name': 'Retrying Plot Sector',
+        'event_type': 'farmer',
+        'trigger': 'Plotting sector retry sector_index',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+)', 'fields': {'farm_index': (1, 'int')}},
+            {'pattern': r'sector_index=(\d+)', 'fields': {'sector_index': (1, 'int')}}
+        ],
+        'samples': ['2024-06-10T08:00:49.708000128Z  WARN {farm_index=1}:subspace_farmer::cluster::plotter: Plotting sector retry sector_index=6']
+    },
+    {
+        'event_name': 'Timed out Without Ping from Plotter',
+        'event_type': 'farmer',
+        'trigger': 'Timed out without ping from plotter',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+)', 'fields': {'farm_index': (1, 'int')}},
+            {'pattern': r'sector_index=(\d+)', 'fields': {'sector_index': (1, 'int')}}
+        ],
+        'samples': ['2024-06-10T08:00:45.322000910Z  WARN {farm_index=0}:subspace_farmer::cluster::plotter: Timed out without ping from plotter sector_index=564']
+    },
+    {
+        'event_name': 'Farm expired and removed',
+        'event_type': 'farmer',
+        'trigger': 'Farm expired and removed',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+)', 'fields': {'farm_index': (1, 'str')}},
+            {'pattern': r'farm_id=([\w\d]+)', 'fields': {'farm_id': (1, 'str')}}
+        ],
+        'samples': ['2024-06-10T08:00:00.000000000Z  INFO subspace_farmer::commands::cluster::controller::farms: Farm expired and removed farm_index=0 farm_id=01J0ABCDEF1234']
+    },
+    {
+        'event_name': 'Farm Farm Exited Successfully',
+        'event_type': 'farmer',
+        'trigger': 'Farm exited successfully farm_index',
+        'patterns': [
+            {'pattern': r'farm_index=(\d+)', 'fields': {'farm_index': (1, 'str')}}
+        ],
+        'samples': ['2024-06-10T08:00:10.965000982Z  INFO subspace_farmer::cluster::controller::farms: Farm exited successfully farm_index=22']
+    },
+    {
+        'event_name': 'Solution was Ignored',
+        'event_type': 'farmer',
+        'trigger': 'Solution was ignored',
+        'patterns': [
+            {'pattern': r'slot=(\d+)', 'fields': {'slot': (1, 'str')}},
+            {'pattern': r'public_key=([0-9a-f]+)', 'fields': {'public_key': (1, 'str')}},
+            {'pattern': r'sector_index=(\d+)', 'fields': {'sector_index': (1, 'str')}}
+        ],
+        'samples': ['2024-06-10T08:05:20.178000631Z  WARN {farm_index=3}:subspace_farmer::single_disk_farm::farming: Solution was ignored, likely because farmer was too slow slot=76949175 public_key=03d2b995241845a79b64e3e1525ad63274b4c361dc1e9cc0c3a674b17401cd95 sector_index=4973']
+    }
+]
+
+
+# Routing table used by StreamParser.handle_event.
+#
+# Maps an event name to what is written to Nexus for it. Every event is
+# stored with create_event unless 'create' is False, events without an
+# entry are only stored. 'upsert' updates the entity named by the
+# container type ('container', with the event's data) or by the event type
+# ('event_type', with the whole event). 'insert' adds the whole event to
+# the plot, reward or claim table, after the upsert. 'low_value' upserts
+# may be dropped when Nexus falls behind, 'max_age' skips the upsert for
+# events that many hours old and 'coalesce' lets the Coalescer send only
+# the newest one. Names must match the rule table and key_events exactly,
+# this is checked whenever the rules are loaded.
+
+event_routes = {
+    'Register RPC URL': {'upsert': 'container'},
+    'Detecting L3 Cache Groups': {'upsert': 'container'},
+    'Preparing Plotting Thread Pools': {'upsert': 'container'},
+    'Checking Plot Cache Contents': {'upsert': 'event_type'},
+    'Finished Checking Plot Cache Contents': {'upsert': 'event_type'},
+    'Downloading Segment Headers': {'upsert': 'container'},
+    'Downloaded All Segment Headers': {'upsert': 'container'},
+    'NATs Connected': {'upsert': 'container'},
+    'NATs Disconnected': {'upsert': 'container'},
+    'Benchmarking Proving Method': {'upsert': 'event_type'},
+    'Subscribing to Slot Info Notifications': {'upsert': 'event_type'},
+    'Subscribing to Reward Signing Notifications': {'upsert': 'event_type'},
+    'Subscribing to Archived Segments': {'upsert': 'event_type'},
+    'Found Fastest Mode': {'upsert': 'event_type'},
+    'Register Farm ID': {'upsert': 'event_type'},
+    'Register Genesis Hash': {'upsert': 'event_type'},
+    'Register Public Key': {'upsert': 'event_type'},
+    'Register Allocated Space': {'upsert': 'event_type'},
+    'Register Directory': {'upsert': 'event_type'},
+    'Collecting Plotted Pieces': {'upsert': 'container'},
+    'Finished Collecting Plotted Pieces': {'upsert': 'container'},
+    'Initializing Piece Cache': {'upsert': 'container'},
+    'Syncronizing Piece Cache': {'upsert': 'container'},
+    'Piece Cache Sync': {'upsert': 'container', 'coalesce': True},
+    'Finished Piece Cache Syncronization': {'upsert': 'container'},
+    'Plotting Sector': {'upsert': 'event_type', 'insert': 'plot', 'coalesce': True},
+    'Signed Reward Hash': {'insert': 'reward'},
+    'Initial Plotting Complete': {'upsert': 'event_type', 'insert': 'plot'},
+    'Replotting Sector': {'upsert': 'event_type', 'insert': 'plot'},
+    'Replotting Complete': {'upsert': 'event_type', 'insert': 'plot'},
+    'Failed to Send Solution': {'insert': 'reward'},
+    'Plot Sector Request': {'upsert': 'container'},
+    'Finished Plotting Sector': {'upsert': 'container'},
+    'Idle': {'create': False, 'upsert': 'container', 'low_value': True, 'max_age': 1, 'coalesce': True},
+    'Preparing': {'upsert': 'container', 'low_value': True, 'max_age': 1, 'coalesce': True},
+    'Syncing': {'create': False, 'upsert': 'container', 'low_value': True, 'max_age': 1, 'coalesce': True},
+    'Pending': {'create': False, 'upsert': 'container', 'low_value': True, 'max_age': 1, 'coalesce': True},
+    'Claim': {'create': False, 'insert': 'claim'},
+    'Imported': {'create': False},
+    'Reorg': {'create': False},
+}
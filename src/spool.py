@@ -0,0 +1,211 @@
+import os
+import threading
+import time
+
+from src.logger import logger
+
+
+class Spool:
+    # Append-only write-ahead log for Nexus writes. Records are single lines
+    # in numbered segment files that rotate at segment_bytes. The reader
+    # acknowledges a (segment, offset) position once everything before it
+    # has been delivered; that position is persisted atomically, so after a
+    # crash delivery resumes from the exact byte it stopped at. Fully
+    # acknowledged segments are deleted, and when the spool grows past
+    # max_bytes the oldest segment is discarded.
+    def __init__(self, path, segment_bytes=16 * 1024 ** 2, max_bytes=1024 ** 3, fsync_interval=1.0):
+        self.path = path
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync_interval = fsync_interval
+        self.lock = threading.Lock()
+        self.last_fsync = time.monotonic()
+
+        os.makedirs(path, exist_ok=True)
+
+        self.segments = sorted(
+            int(name.split('.')[0]) for name in os.listdir(path) if name.endswith('.log')
+        )
+        self.acked = self.load_ack()
+
+        # Segments before the acknowledged one were already delivered
+        for segment in [segment for segment in self.segments if segment < self.acked[0]]:
+            self.remove_segment(segment)
+
+        if not self.segments:
+            self.segments.append(self.acked[0])
+
+        self.repair_tail()
+        self.writer = open(self.segment_path(self.segments[-1]), 'ab')
+        self.sizes = {segment: self.segment_size(segment) for segment in self.segments}
+        self.pending = self.count_pending()
+
+        if self.pending:
+            logger.info(f"Spool {path} has {self.pending} undelivered records from a previous run")
+
+    def segment_path(self, segment):
+        return os.path.join(self.path, f"{segment:010d}.log")
+
+    def segment_size(self, segment):
+        path = self.segment_path(segment)
+        return os.path.getsize(path) if os.path.exists(path) else 0
+
+    def load_ack(self):
+        try:
+            with open(os.path.join(self.path, 'ack'), 'r') as f:
+                segment, offset = f.read().split()
+                return int(segment), int(offset)
+        except (FileNotFoundError, ValueError):
+            return (self.segments[0] if self.segments else 0), 0
+
+    def save_ack(self):
+        ack_path = os.path.join(self.path, 'ack')
+        with open(ack_path + '.tmp', 'w') as f:
+            f.write(f"{self.acked[0]} {self.acked[1]}")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(ack_path + '.tmp', ack_path)
+
+    def repair_tail(self):
+        # A crash mid-append can leave a partial last record, cut it off so
+        # the next append does not get glued onto it
+        path = self.segment_path(self.segments[-1])
+        if not os.path.exists(path):
+            return
+
+        with open(path, 'rb+') as f:
+            data = f.read()
+            end = data.rfind(b'\n') + 1
+            if end != len(data):
+                f.truncate(end)
+                logger.warning(f"Spool {self.path} dropped a partial record at the end of {path}")
+
+    def count_pending(self):
+        pending = 0
+        for segment in self.segments:
+            with open(self.segment_path(segment), 'rb') as f:
+                if segment == self.acked[0]:
+                    f.seek(self.acked[1])
+                pending += sum(1 for _ in f)
+        return pending
+
+    def remove_segment(self, segment):
+        try:
+            os.remove(self.segment_path(segment))
+        except FileNotFoundError:
+            pass
+        self.segments.remove(segment)
+
+    def append(self, record):
+        data = record.encode('utf-8') + b'\n'
+
+        with self.lock:
+            self.writer.write(data)
+            self.writer.flush()
+            self.pending += 1
+
+            current = self.segments[-1]
+            self.sizes[current] = self.sizes.get(current, 0) + len(data)
+
+            now = time.monotonic()
+            if now - self.last_fsync >= self.fsync_interval:
+                os.fsync(self.writer.fileno())
+                self.last_fsync = now
+
+            if self.sizes[current] >= self.segment_bytes:
+                self.rotate()
+
+            # How many undelivered records had to be discarded for this one
+            if sum(self.sizes.values()) > self.max_bytes and len(self.segments) > 1:
+                return self.discard_oldest()
+            return 0
+
+    def rotate(self):
+        os.fsync(self.writer.fileno())
+        self.writer.close()
+
+        segment = self.segments[-1] + 1
+        self.segments.append(segment)
+        self.sizes[segment] = 0
+        self.writer = open(self.segment_path(segment), 'ab')
+
+    def discard_oldest(self):
+        # Out of disk budget: give up on the oldest undelivered records
+        segment = self.segments[0]
+        with open(self.segment_path(segment), 'rb') as f:
+            if segment == self.acked[0]:
+                f.seek(self.acked[1])
+            lost = sum(1 for _ in f)
+
+        self.remove_segment(segment)
+        self.sizes.pop(segment, None)
+        self.pending -= lost
+        self.acked = (self.segments[0], 0)
+        self.save_ack()
+
+        logger.warning(f"Spool {self.path} exceeded {self.max_bytes} bytes, discarded {lost} undelivered records")
+        return lost
+
+    def read(self, max_records):
+        # Returns up to max_records complete lines after the acknowledged
+        # position, the position right after the last one returned, and how
+        # many of them came from each segment
+        records = []
+        counts = {}
+
+        with self.lock:
+            self.writer.flush()
+            segments = list(self.segments)
+
+        segment, offset = self.acked
+        if segment not in segments:
+            segment, offset = segments[0], 0
+        index = segments.index(segment)
+
+        while len(records) < max_records:
+            try:
+                with open(self.segment_path(segment), 'rb') as f:
+                    f.seek(offset)
+                    while len(records) < max_records:
+                        line = f.readline()
+                        if not line.endswith(b'\n'):
+                            break
+                        records.append(line[:-1].decode('utf-8'))
+                        counts[segment] = counts.get(segment, 0) + 1
+                        offset += len(line)
+            except FileNotFoundError:
+                # Discarded while we were reading, the next read starts over
+                break
+
+            if len(records) >= max_records or index + 1 >= len(segments):
+                break
+
+            # Finished this segment, continue with the next one
+            index += 1
+            segment, offset = segments[index], 0
+
+        return records, (segment, offset), counts
+
+    def ack(self, position, counts):
+        with self.lock:
+            # Records of segments discarded since the read were already
+            # written off by discard_oldest
+            self.pending -= sum(count for segment, count in counts.items() if segment in self.segments)
+
+            # The segment was discarded meanwhile, so there is nothing left
+            # to acknowledge
+            if position[0] < self.acked[0]:
+                return
+
+            self.acked = position
+            self.save_ack()
+
+            for segment in [segment for segment in self.segments if segment < position[0]]:
+                self.remove_segment(segment)
+                self.sizes.pop(segment, None)
+
+    def close(self):
+        with self.lock:
+            self.writer.flush()
+            os.fsync(self.writer.fileno())
+            self.writer.close()
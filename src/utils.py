@@ -1,12 +1,30 @@
-from datetime import datetime, timedelta
-import re
+import calendar
+
 
 class Utils:
+    # Epoch seconds by normalized date. Log lines mostly share their second
+    # with the lines around them, so only a new second is ever converted.
+    epochs = {}
+    max_epochs = 4096
+
     @staticmethod
     def normalize_date(date_str):
-        # Truncate the fractional seconds to 6 digits
-        truncated_date_str = date_str[:26] + 'Z'
-        # Parse the input date string
-        dt = datetime.strptime(truncated_date_str, '%Y-%m-%dT%H:%M:%S.%fZ')
-        # Return the formatted date string
-        return dt.strftime('%Y-%m-%d %H:%M:%S')
\ No newline at end of file
+        # RFC3339 in UTC from Docker, e.g. 2024-06-10T08:00:00.123456789Z,
+        # to '2024-06-10 08:00:00' by position. The fraction is dropped.
+        return date_str[:10] + ' ' + date_str[11:19]
+
+    @staticmethod
+    def to_epoch(date_str):
+        # A normalized date to Unix time, without strptime
+        epoch = Utils.epochs.get(date_str)
+        if epoch is None:
+            epoch = calendar.timegm((
+                int(date_str[0:4]), int(date_str[5:7]), int(date_str[8:10]),
+                int(date_str[11:13]), int(date_str[14:16]), int(date_str[17:19])
+            ))
+
+            if len(Utils.epochs) >= Utils.max_epochs:
+                Utils.epochs.clear()
+            Utils.epochs[date_str] = epoch
+
+        return epoch
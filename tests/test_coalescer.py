@@ -0,0 +1,80 @@
+import threading
+import unittest
+
+from src.coalescer import Coalescer
+from src.event import Event
+from src.nexus import Nexus
+from src.streamparser import StreamParser
+
+
+class Recorder:
+    def __init__(self):
+        self.items = []
+
+    def add(self, action, entity, item, low_value=False):
+        self.items.append((action, entity, item))
+
+
+class CoalescerTest(unittest.TestCase):
+    def setUp(self):
+        self.recorder = Recorder()
+        Nexus.local.batcher = self.recorder
+
+    def tearDown(self):
+        Nexus.local.batcher = None
+
+    def add(self, coalescer, name):
+        data = {'status': name, 'container_id': 'node-1'}
+        event = Event(name, 'node', 'node', 'node', 'INFO', 'node-1', '2024-06-10 08:00:00', data)
+        coalescer.add(event, 'node', data, low_value=True)
+
+    def test_flush_sends_latest_status_last(self):
+        coalescer = Coalescer('http://nexus')
+        for name in ['Idle', 'Syncing', 'Idle']:
+            self.add(coalescer, name)
+
+        coalescer.flush()
+
+        self.assertEqual([item['status'] for _, _, item in self.recorder.items], ['Syncing', 'Idle'])
+
+    def test_newer_write_waits_for_flush_in_progress(self):
+        coalescer = Coalescer('http://nexus')
+        self.add(coalescer, 'Syncing')
+
+        # The coalescer thread is held inside its send of the status
+        sending = threading.Event()
+        release = threading.Event()
+        recorder = self.recorder
+
+        class BlockingRecorder(Recorder):
+            def add(self, action, entity, item, low_value=False):
+                if item['status'] == 'Syncing':
+                    sending.set()
+                    release.wait(5)
+                recorder.add(action, entity, item, low_value)
+
+        Nexus.batcher = BlockingRecorder()
+        Nexus.local.batcher = None
+        StreamParser.coalescer = coalescer
+        try:
+            flusher = threading.Thread(target=coalescer.flush)
+            flusher.start()
+            self.assertTrue(sending.wait(5))
+
+            writer = threading.Thread(target=StreamParser.upsert_entity, args=('http://nexus', 'node-1', 'node', {'status': 'Idle', 'container_id': 'node-1'}))
+            writer.start()
+            writer.join(0.2)
+            self.assertEqual(self.recorder.items, [])
+
+            release.set()
+            flusher.join(5)
+            writer.join(5)
+        finally:
+            Nexus.batcher = None
+            StreamParser.coalescer = None
+
+        self.assertEqual([item['status'] for _, _, item in self.recorder.items], ['Syncing', 'Idle'])
+
+
+if __name__ == '__main__':
+    unittest.main()